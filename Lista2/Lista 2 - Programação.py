@@ -7,10 +7,28 @@ Created on Sat Jun  7 19:20:06 2025
 import math
 import itertools
 import random
-import urllib.request
+import urllib.error
+import urllib.parse
+import http.client
 import os
 import csv
-import sys
+import hashlib
+import json
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # só é necessário para o formato colunar
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 
 # Parte 1
@@ -81,25 +99,128 @@ if __name__ == "__main__":
 # Parte 2
 
 # Função 1 - Combinações de ativos
-def portfolio_combinations(assets, k):
+def _validar_combinacao(assets, k):
+    if not isinstance(assets, list) or not all(isinstance(a, str) for a in assets):
+        raise ValueError("Assets deve ser uma lista de strings.")
+    if not isinstance(k, int) or k <= 0:
+        raise ValueError("k deve ser um inteiro positivo.")
+    if k > len(assets):
+        raise ValueError("k não pode ser maior que o número de ativos.")
+
+
+def count_combinations(assets, k):
+    """
+    Número exato de combinações de k ativos, sem enumerá-las (C(n, k)).
+
+    Parâmetros:
+    - assets: lista de nomes de ativos (strings)
+    - k: tamanho da combinação
+
+    Retorna:
+    - Inteiro com o número de combinações
+    """
+    _validar_combinacao(assets, k)
+    return math.comb(len(assets), k)
+
+
+def _indices_por_posto(n, k, rank):
+    # Sistema numérico combinatório: escolhe cada índice pulando blocos de C(n - x - 1, k - i - 1)
+    indices = []
+    x = 0
+    for i in range(k):
+        while True:
+            bloco = math.comb(n - x - 1, k - i - 1)
+            if rank < bloco:
+                break
+            rank -= bloco
+            x += 1
+        indices.append(x)
+        x += 1
+    return indices
+
+
+def unrank_combination(assets, k, rank):
+    """
+    Retorna a combinação de posição `rank` na ordem de `itertools.combinations`, sem enumerar as anteriores.
+
+    Parâmetros:
+    - assets: lista de nomes de ativos (strings)
+    - k: tamanho da combinação
+    - rank: posição da combinação, de 0 a C(n, k) - 1
+
+    Retorna:
+    - Tupla com os ativos da combinação
+    """
+    total = count_combinations(assets, k)
+    if not isinstance(rank, int) or not 0 <= rank < total:
+        raise ValueError(f"rank deve ser um inteiro entre 0 e {total - 1}.")
+    return tuple(assets[i] for i in _indices_por_posto(len(assets), k, rank))
+
+
+def _combinacoes_intervalo(assets, k, start, stop):
+    # Começa no posto `start` e avança em ordem lexicográfica até `stop`
+    if start >= stop:
+        return
+    n = len(assets)
+    indices = _indices_por_posto(n, k, start)
+    for _ in range(stop - start):
+        yield tuple(assets[i] for i in indices)
+        i = k - 1
+        while i >= 0 and indices[i] == n - k + i:
+            i -= 1
+        if i < 0:
+            return
+        indices[i] += 1
+        for j in range(i + 1, k):
+            indices[j] = indices[j - 1] + 1
+
+
+def split_combinations(assets, k, parts):
+    """
+    Divide o espaço de combinações em `parts` intervalos disjuntos de postos, de tamanhos parecidos.
+
+    Cada intervalo (start, stop) pode ser entregue a um worker, que o percorre com
+    `portfolio_combinations(assets, k, lazy=True, start=start, stop=stop)` sem coordenação.
+
+    Parâmetros:
+    - assets: lista de nomes de ativos (strings)
+    - k: tamanho da combinação
+    - parts: número de intervalos
+
+    Retorna:
+    - Lista de tuplas (start, stop)
+    """
+    if not isinstance(parts, int) or parts <= 0:
+        raise ValueError("parts deve ser um inteiro positivo.")
+    total = count_combinations(assets, k)
+    limites = [total * p // parts for p in range(parts + 1)]
+    return [(limites[p], limites[p + 1]) for p in range(parts) if limites[p] < limites[p + 1]]
+
+
+def portfolio_combinations(assets, k, lazy=False, start=0, stop=None):
     """
     Retorna todas as combinações possíveis de k ativos a partir de uma lista.
     
     Parâmetros:
     - assets: lista de nomes de ativos (strings)
     - k: tamanho da combinação
+    - lazy: se True, retorna um iterador em vez de materializar a lista
+    - start, stop: intervalo de postos [start, stop) na ordem de `itertools.combinations`;
+      o início é localizado diretamente, sem percorrer as combinações anteriores
 
     Retorna:
-    - Lista de tuplas com combinações de ativos
+    - Lista (ou iterador, com lazy=True) de tuplas com combinações de ativos
     """
-    if not isinstance(assets, list) or not all(isinstance(a, str) for a in assets):
-        raise ValueError("Assets deve ser uma lista de strings.")
-    if not isinstance(k, int) or k <= 0:
-        raise ValueError("k deve ser um inteiro positivo.")
-    if k > len(assets):
-        raise ValueError("k não pode ser maior que o número de ativos.")
+    total = count_combinations(assets, k)
+    stop = total if stop is None else stop
+    if not isinstance(start, int) or not isinstance(stop, int) or not 0 <= start <= stop <= total:
+        raise ValueError(f"start e stop devem satisfazer 0 <= start <= stop <= {total}.")
 
-    return list(itertools.combinations(assets, k))
+    if start == 0 and stop == total:
+        combinacoes = itertools.combinations(assets, k)
+    else:
+        combinacoes = _combinacoes_intervalo(assets, k, start, stop)
+    return combinacoes if lazy else list(combinacoes)
 
 
 # Função 2 - Média Móvel usando itertools
@@ -149,7 +270,7 @@ if __name__ == "__main__":
 # Parte 3
 
 # Função - Simulação de Preços de Ações com Distribuição Normal
-def simulate_stock_price(initial_price, mu, sigma, days):
+def simulate_stock_price(initial_price, mu, sigma, days, rng=None):
     """
     Simula uma trajetória de preço de ação com base em movimentos diários aleatórios,
     com distribuição normal dos retornos.
@@ -159,6 +280,8 @@ def simulate_stock_price(initial_price, mu, sigma, days):
     - mu: retorno médio esperado por dia (float)
     - sigma: volatilidade (desvio padrão) dos retornos diários (float)
     - days: número de dias a simular (int)
+    - rng: gerador random.Random próprio (opcional); sem ele usa o gerador global,
+      o que impede simulações paralelas reprodutíveis
 
     Retorna:
     - Lista com os preços simulados
@@ -168,9 +291,10 @@ def simulate_stock_price(initial_price, mu, sigma, days):
     if initial_price <= 0 or sigma < 0 or days <= 0:
         raise ValueError("Preço inicial deve ser > 0, sigma >= 0 e dias > 0.")
 
+    gauss = rng.gauss if rng is not None else random.gauss
     prices = [initial_price]
     for _ in range(days):
-        retorno_diario = random.gauss(mu, sigma)
+        retorno_diario = gauss(mu, sigma)
         novo_preco = prices[-1] * (1 + retorno_diario)
         prices.append(novo_preco)
 
@@ -190,58 +314,784 @@ if __name__ == "__main__":
 
 
 # Função - Download e Merge de CSVs do BLS
-def download_and_merge(years_quarters, output_file):
+BLS_URL = "https://data.bls.gov/cew/data/api/{year}/{quarter}/industry/10.csv"
+
+# Conexões HTTP reutilizadas por thread, uma por (esquema, host)
+_conexoes_locais = threading.local()
+
+# Redirecionamentos (3xx) seguidos em uma tentativa antes de desistir
+_MAX_REDIRECIONAMENTOS = 5
+
+
+class _ErroTransitorio(Exception):
+    """
+    Falha de rede ou do servidor que vale a pena tentar de novo.
+    """
+
+
+def _conexao(partes, timeout):
+    conexoes = getattr(_conexoes_locais, "conexoes", None)
+    if conexoes is None:
+        conexoes = _conexoes_locais.conexoes = {}
+    chave = (partes.scheme, partes.netloc)
+    if chave not in conexoes:
+        classe = http.client.HTTPSConnection if partes.scheme == "https" else http.client.HTTPConnection
+        conexoes[chave] = classe(partes.netloc, timeout=timeout)
+    return conexoes[chave]
+
+
+def _descartar_conexao(partes):
+    conexao = getattr(_conexoes_locais, "conexoes", {}).pop((partes.scheme, partes.netloc), None)
+    if conexao is not None:
+        conexao.close()
+
+
+def _total_content_range(valor):
+    # "bytes 100-199/1000" ou "bytes */1000"
+    if not valor or "/" not in valor:
+        return None
+    total = valor.rsplit("/", 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+
+def _caminho_requisicao(partes):
+    return (partes.path or "/") + ("?" + partes.query if partes.query else "")
+
+
+def _descartar_parcial(parcial):
+    for caminho in (parcial, parcial + ".json"):
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+
+def _ler_validadores_parcial(parcial):
+    try:
+        with open(parcial + ".json", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _valor_if_range(validadores):
+    # If-Range aceita só ETag forte ou data
+    etag = validadores.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return validadores.get("last_modified")
+
+
+def _baixar_uma_vez(url, destino, timeout, condicionais=None, bloco=1 << 16):
+    """
+    Uma tentativa de download para `destino`, retomando de `destino + '.part'` se existir.
+
+    Os validadores (ETag/Last-Modified) da versão sendo baixada ficam em
+    `destino + '.part.json'`, e a retomada usa Range com If-Range: se o arquivo
+    mudou no servidor, a resposta é 200 com o conteúdo novo e o parcial é
+    reescrito do zero, sem misturar versões. Parciais sem validadores são
+    descartados. Redirecionamentos são seguidos até `_MAX_REDIRECIONAMENTOS`.
+
+    O arquivo só é renomeado para `destino` depois de conferido o tamanho
+    anunciado pelo servidor; falhas no meio deixam o parcial para a próxima tentativa.
+    `condicionais` (If-None-Match/If-Modified-Since) são enviados só quando não
+    há parcial. Retorna os validadores {"etag", "last_modified"} da resposta, ou
+    None se o servidor respondeu 304 (conteúdo não modificado).
+    """
+    parcial = destino + ".part"
+    inicio = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+    validadores = _ler_validadores_parcial(parcial) if inicio else None
+    if_range = _valor_if_range(validadores) if validadores else None
+    if inicio and not if_range:
+        # sem validador não há como saber se o parcial é da versão atual
+        _descartar_parcial(parcial)
+        inicio = 0
+    if inicio:
+        cabecalhos = {"Range": f"bytes={inicio}-", "If-Range": if_range}
+    else:
+        cabecalhos = dict(condicionais or {})
+
+    partes = urllib.parse.urlsplit(url)
+    try:
+        for _ in range(_MAX_REDIRECIONAMENTOS + 1):
+            conexao = _conexao(partes, timeout)
+            conexao.request("GET", _caminho_requisicao(partes), headers=cabecalhos)
+            resposta = conexao.getresponse()
+            if resposta.status not in (301, 302, 303, 307, 308):
+                break
+            resposta.read()
+            destino_redirecionado = resposta.getheader("Location")
+            if resposta.will_close:
+                _descartar_conexao(partes)
+            if not destino_redirecionado:
+                raise urllib.error.HTTPError(url, resposta.status, "redirecionamento sem Location",
+                                             resposta.headers, None)
+            url = urllib.parse.urljoin(url, destino_redirecionado)
+            partes = urllib.parse.urlsplit(url)
+        else:
+            raise urllib.error.HTTPError(url, resposta.status, "redirecionamentos demais",
+                                         resposta.headers, None)
+        status = resposta.status
+        if status == 304 and not inicio:
+            resposta.read()
+            if resposta.will_close:
+                _descartar_conexao(partes)
+            return None
+        if status == 416 and inicio:
+            resposta.read()
+            if _total_content_range(resposta.getheader("Content-Range")) != inicio:
+                _descartar_parcial(parcial)
+                raise _ErroTransitorio("arquivo parcial inconsistente com o servidor")
+            total = inicio
+        elif status == 429 or status >= 500:
+            resposta.read()
+            raise _ErroTransitorio(f"HTTP {status}")
+        elif status not in (200, 206):
+            resposta.read()
+            raise urllib.error.HTTPError(url, status, resposta.reason, resposta.headers, None)
+        else:
+            if status == 206:
+                etag = resposta.getheader("ETag")
+                if etag and validadores.get("etag") and etag != validadores["etag"]:
+                    # servidor ignorou o If-Range: o restante é de outra versão
+                    resposta.close()
+                    _descartar_parcial(parcial)
+                    raise _ErroTransitorio("arquivo mudou no servidor durante a retomada")
+                total = _total_content_range(resposta.getheader("Content-Range"))
+                modo = "ab"
+            else:
+                comprimento = resposta.getheader("Content-Length")
+                total = int(comprimento) if comprimento is not None else None
+                modo = "wb"
+                validadores = {"etag": resposta.getheader("ETag"),
+                               "last_modified": resposta.getheader("Last-Modified")}
+                with open(parcial + ".json", "w", encoding="utf-8") as f:
+                    json.dump(validadores, f)
+            with open(parcial, modo) as f:
+                while True:
+                    dados = resposta.read(bloco)
+                    if not dados:
+                        break
+                    f.write(dados)
+    except (OSError, http.client.HTTPException) as e:
+        _descartar_conexao(partes)
+        if isinstance(e, urllib.error.HTTPError):
+            raise
+        raise _ErroTransitorio(str(e)) from e
+    except _ErroTransitorio:
+        _descartar_conexao(partes)
+        raise
+
+    tamanho = os.path.getsize(parcial)
+    if total is not None and tamanho != total:
+        _descartar_conexao(partes)
+        raise _ErroTransitorio(f"recebidos {tamanho} de {total} bytes")
+    if resposta.will_close:
+        _descartar_conexao(partes)
+    os.replace(parcial, destino)
+    _descartar_parcial(parcial)
+    return {"etag": resposta.getheader("ETag") or validadores.get("etag"),
+            "last_modified": resposta.getheader("Last-Modified") or validadores.get("last_modified")}
+
+
+def _baixar_com_retentativas(url, destino, retries, backoff, timeout, condicionais=None):
+    for tentativa in range(retries + 1):
+        try:
+            return _baixar_uma_vez(url, destino, timeout, condicionais)
+        except _ErroTransitorio as e:
+            if tentativa == retries:
+                raise ConnectionError(f"{e} (após {retries + 1} tentativas)") from e
+            # backoff exponencial com jitter, para não sincronizar as retentativas
+            time.sleep(backoff * 2 ** tentativa * (1 + random.random()))
+
+
+def _baixar_arquivo(ano, trimestre, url, destino, retries, backoff, timeout):
+    _baixar_com_retentativas(url, destino, retries, backoff, timeout)
+    return destino
+
+
+class _TravaArquivo:
+    """
+    Lock exclusivo entre processos (e entre threads) baseado em um arquivo.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def __enter__(self):
+        self._arquivo = open(self.caminho, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    self._arquivo.seek(0)
+                    msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        return self
+
+    def __exit__(self, *args):
+        if fcntl is not None:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_UN)
+        else:
+            self._arquivo.seek(0)
+            msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+        self._arquivo.close()
+
+
+def _sha256_arquivo(caminho, bloco=1 << 20):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for dados in iter(lambda: f.read(bloco), b""):
+            h.update(dados)
+    return h.hexdigest()
+
+
+class QuarterCache:
+    """
+    Cache local de arquivos trimestrais do BLS, endereçado por conteúdo.
+
+    Cada entrada é identificada por (ano, trimestre, URL) e aponta para um
+    objeto em 'objetos/<sha256>', de modo que conteúdos iguais são guardados
+    uma só vez. O manifesto 'manifest.json' registra hash, tamanho, ETag,
+    Last-Modified e último acesso de cada entrada.
+
+    Trimestres antigos não mudam e são servidos sem nenhum acesso à rede; os
+    `recent_quarters` trimestres mais recentes são revalidados com uma
+    requisição condicional (If-None-Match/If-Modified-Since), que custa só
+    um 304 quando nada mudou. Quando o total passa de `max_bytes`, as entradas
+    usadas há mais tempo são removidas (LRU).
+
+    O acesso é seguro entre threads e processos: o manifesto é lido e gravado
+    sob um lock de arquivo, e cada entrada tem seu próprio lock durante o
+    download, de modo que dois processos não baixam o mesmo trimestre ao mesmo tempo.
+
+    Parâmetros:
+    - cache_dir: pasta do cache
+    - max_bytes: tamanho máximo dos objetos guardados
+    - recent_quarters: quantos trimestres, contando o atual, são revalidados a cada uso
+    """
+
+    def __init__(self, cache_dir, max_bytes=4 * 1024 ** 3, recent_quarters=4):
+        if not isinstance(max_bytes, int) or max_bytes <= 0:
+            raise ValueError("max_bytes deve ser um inteiro positivo.")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.recent_quarters = recent_quarters
+        for sub in ("objetos", "locks", "tmp"):
+            os.makedirs(os.path.join(cache_dir, sub), exist_ok=True)
+
+    def _objeto(self, sha):
+        return os.path.join(self.cache_dir, "objetos", sha)
+
+    def _recente(self, ano, trimestre):
+        hoje = time.localtime()
+        atual = hoje.tm_year * 4 + (hoje.tm_mon - 1) // 3
+        return atual - (int(ano) * 4 + int(trimestre) - 1) < self.recent_quarters
+
+    def _ler_manifesto(self):
+        try:
+            with open(os.path.join(self.cache_dir, "manifest.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _gravar_manifesto(self, entradas):
+        caminho = os.path.join(self.cache_dir, "manifest.json")
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(entradas, f, indent=1)
+        os.replace(temporario, caminho)
+
+    def _trava_manifesto(self):
+        return _TravaArquivo(os.path.join(self.cache_dir, "locks", "manifest.lock"))
+
+    def manifest(self):
+        """
+        Retorna uma cópia do manifesto: {chave: entrada}.
+        """
+        with self._trava_manifesto():
+            return self._ler_manifesto()
+
+    def _remover_objeto(self, sha):
+        try:
+            os.remove(self._objeto(sha))
+        except OSError:
+            pass
+
+    def _despejar(self, entradas, manter):
+        # Chamado com o manifesto travado. Objetos fora do manifesto (de versões
+        # substituídas ou de um processo interrompido) nunca são servidos: saem primeiro.
+        tamanhos = {e["sha256"]: e["tamanho"] for e in entradas.values()}
+        for sha in os.listdir(os.path.join(self.cache_dir, "objetos")):
+            if sha not in tamanhos:
+                self._remover_objeto(sha)
+        # Depois, remove entradas por ordem de último acesso até caber em max_bytes
+        total = sum(tamanhos.values())
+        for chave in sorted(entradas, key=lambda c: entradas[c]["ultimo_acesso"]):
+            if total <= self.max_bytes:
+                break
+            if chave == manter:
+                continue
+            sha = entradas.pop(chave)["sha256"]
+            if all(e["sha256"] != sha for e in entradas.values()):
+                total -= tamanhos[sha]
+                self._remover_objeto(sha)
+
+    def _materializar(self, sha, destino):
+        # Cópia, não hard link: escritas no destino não podem alterar o objeto do cache.
+        # shutil.copyfile já copia dentro do kernel (sendfile) quando o sistema permite.
+        temporario = destino + ".tmp"
+        shutil.copyfile(self._objeto(sha), temporario)
+        os.replace(temporario, destino)
+
+    def fetch(self, ano, trimestre, url, destino, retries=4, backoff=0.5, timeout=30):
+        """
+        Disponibiliza o trimestre em `destino`, baixando-o só se necessário.
+
+        Retorna:
+        - Caminho `destino`
+        """
+        chave = hashlib.sha256(f"{ano}|{trimestre}|{url}".encode()).hexdigest()
+        temporario = os.path.join(self.cache_dir, "tmp", chave + ".csv")
+        with _TravaArquivo(os.path.join(self.cache_dir, "locks", chave + ".lock")):
+            condicionais = None
+            with self._trava_manifesto():
+                entradas = self._ler_manifesto()
+                entrada = entradas.get(chave)
+                if entrada is not None and os.path.exists(self._objeto(entrada["sha256"])):
+                    if not self._recente(ano, trimestre):
+                        entrada["ultimo_acesso"] = time.time()
+                        self._gravar_manifesto(entradas)
+                        self._materializar(entrada["sha256"], destino)
+                        return destino
+                    condicionais = {}
+                    if entrada.get("etag"):
+                        condicionais["If-None-Match"] = entrada["etag"]
+                    if entrada.get("last_modified"):
+                        condicionais["If-Modified-Since"] = entrada["last_modified"]
+
+            validadores = _baixar_com_retentativas(url, temporario, retries, backoff, timeout, condicionais)
+            if validadores is None:
+                with self._trava_manifesto():
+                    entradas = self._ler_manifesto()
+                    entrada = entradas.get(chave)
+                    if entrada is not None and os.path.exists(self._objeto(entrada["sha256"])):
+                        entrada["ultimo_acesso"] = time.time()
+                        self._gravar_manifesto(entradas)
+                        self._materializar(entrada["sha256"], destino)
+                        return destino
+                # o objeto foi despejado enquanto revalidávamos: baixa de novo, sem condicionais
+                validadores = _baixar_com_retentativas(url, temporario, retries, backoff, timeout)
+
+            sha = _sha256_arquivo(temporario)
+            tamanho = os.path.getsize(temporario)
+            with self._trava_manifesto():
+                os.replace(temporario, self._objeto(sha))
+                entradas = self._ler_manifesto()
+                anterior = entradas.get(chave)
+                agora = time.time()
+                entradas[chave] = {
+                    "ano": ano, "trimestre": trimestre, "url": url, "sha256": sha, "tamanho": tamanho,
+                    "etag": validadores["etag"], "last_modified": validadores["last_modified"],
+                    "baixado_em": agora, "ultimo_acesso": agora,
+                }
+                # versão revisada: o objeto antigo sai se nenhuma outra entrada o usa
+                if anterior is not None and anterior["sha256"] != sha and \
+                        all(e["sha256"] != anterior["sha256"] for e in entradas.values()):
+                    self._remover_objeto(anterior["sha256"])
+                self._despejar(entradas, manter=chave)
+                self._gravar_manifesto(entradas)
+                self._materializar(sha, destino)
+            return destino
+
+
+def download_quarters(years_quarters, data_dir="data", max_workers=8, retries=4, backoff=0.5,
+                      timeout=30, base_url=BLS_URL, cache=None):
+    """
+    Baixa em paralelo os CSVs trimestrais do BLS para `data_dir`.
+
+    Cada worker mantém uma conexão HTTP persistente por servidor, falhas
+    transitórias (rede, HTTP 429 e 5xx, download incompleto) são repetidas
+    com backoff exponencial, e downloads interrompidos são retomados com
+    requisições Range/If-Range a partir do arquivo '.part' (recomeçando se o
+    arquivo mudou no servidor). Redirecionamentos são seguidos. Um arquivo só recebe o
+    nome final depois de ter o tamanho conferido com o anunciado pelo servidor.
+
+    Parâmetros:
+    - years_quarters: lista de tuplas (ano, trimestre)
+    - data_dir: pasta onde os arquivos são salvos
+    - max_workers: número máximo de downloads simultâneos
+    - retries: número de novas tentativas após a primeira falha transitória
+    - backoff: espera base em segundos entre tentativas (dobra a cada falha)
+    - timeout: timeout de conexão e leitura em segundos
+    - base_url: modelo da URL com {year} e {quarter} (permite apontar para um servidor local)
+    - cache: QuarterCache opcional; trimestres em cache não geram acesso à rede
+
+    Retorna:
+    - Tupla (baixados, erros): dicionários {(ano, trimestre): caminho} e {(ano, trimestre): mensagem}
+    """
+    if not isinstance(years_quarters, list) or not all(isinstance(yq, tuple) and len(yq) == 2 for yq in years_quarters):
+        raise ValueError("years_quarters deve ser uma lista de tuplas (ano, trimestre)")
+    if not isinstance(max_workers, int) or max_workers <= 0:
+        raise ValueError("max_workers deve ser um inteiro positivo.")
+
+    os.makedirs(data_dir, exist_ok=True)
+    baixados, erros = {}, {}
+    if not years_quarters:
+        return baixados, erros
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(years_quarters))) as pool:
+        futuros = {}
+        for ano, trimestre in years_quarters:
+            url = base_url.format(year=ano, quarter=trimestre)
+            destino = os.path.join(data_dir, f"{ano}_q{trimestre}.csv")
+            baixar = cache.fetch if cache is not None else _baixar_arquivo
+            futuros[(ano, trimestre)] = (url, pool.submit(baixar, ano, trimestre, url, destino,
+                                                          retries, backoff, timeout))
+        for chave, (url, futuro) in futuros.items():
+            try:
+                baixados[chave] = futuro.result()
+            except Exception as e:
+                erros[chave] = f"Erro ao baixar {url}: {e}"
+    return baixados, erros
+
+
+# Tamanho dos blocos na cópia byte a byte quando não há cópia no kernel
+_BLOCO_COPIA = 1 << 20
+
+
+def _linha_cabecalho(linha):
+    return linha.lstrip(b"\xef\xbb\xbf").rstrip(b"\r\n")
+
+
+def _copiar_bytes(origem, destino, inicio, tamanho):
+    """
+    Copia `tamanho` bytes do descritor `origem` (a partir de `inicio`) para a posição atual de `destino`.
+
+    Usa `os.copy_file_range` ou `os.sendfile` quando disponíveis, que copiam
+    dentro do kernel sem passar os dados pelo Python; se o sistema não
+    suportar, continua de onde parou com leituras e escritas em blocos grandes.
+    """
+    feito = 0
+    for copiar in (getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)):
+        if copiar is None:
+            continue
+        try:
+            while feito < tamanho:
+                if copiar is os.sendfile:
+                    n = os.sendfile(destino, origem, inicio + feito, min(tamanho - feito, 1 << 30))
+                else:
+                    n = copiar(origem, destino, min(tamanho - feito, 1 << 30), inicio + feito)
+                if n == 0:
+                    break
+                feito += n
+        except OSError:
+            continue
+        if feito == tamanho:
+            return
+    while feito < tamanho:
+        dados = os.pread(origem, min(tamanho - feito, _BLOCO_COPIA), inicio + feito)
+        if not dados:
+            raise ValueError("Arquivo de entrada encolheu durante a cópia.")
+        feito += os.write(destino, dados)
+
+
+def _merge_bytes(arquivos, output_file, check_headers):
+    with open(output_file, "wb", buffering=0) as saida:
+        cabecalho = None
+        for arq in arquivos:
+            with open(arq, "rb") as entrada:
+                primeira = entrada.readline()
+                if not primeira:
+                    continue
+                if cabecalho is None:
+                    cabecalho = _linha_cabecalho(primeira)
+                    saida.write(primeira if primeira.endswith(b"\n") else primeira + b"\n")
+                elif check_headers and _linha_cabecalho(primeira) != cabecalho:
+                    raise ValueError(f"Cabeçalho de {arq} difere do primeiro arquivo.")
+                inicio = len(primeira)
+                tamanho = os.fstat(entrada.fileno()).st_size - inicio
+                if tamanho <= 0:
+                    continue
+                _copiar_bytes(entrada.fileno(), saida.fileno(), inicio, tamanho)
+                # garante a quebra de linha entre o fim de um arquivo e o começo do próximo
+                if os.pread(entrada.fileno(), 1, inicio + tamanho - 1) != b"\n":
+                    saida.write(b"\n")
+
+
+def _merge_linhas(arquivos, output_file, check_headers, columns, row_filter):
+    with open(output_file, "w", newline="", encoding="utf-8") as outfile:
+        escritor = csv.writer(outfile)
+        cabecalho = indices = None
+        for arq in arquivos:
+            with open(arq, "r", newline="", encoding="utf-8-sig") as infile:
+                leitor = csv.reader(infile)
+                atual = next(leitor, None)
+                if atual is None:
+                    continue
+                if cabecalho is None:
+                    cabecalho = atual
+                    if columns is not None:
+                        faltando = [c for c in columns if c not in cabecalho]
+                        if faltando:
+                            raise ValueError(f"Colunas inexistentes: {faltando}")
+                        indices = [cabecalho.index(c) for c in columns]
+                    escritor.writerow(cabecalho if indices is None else [cabecalho[i] for i in indices])
+                elif check_headers and atual != cabecalho:
+                    raise ValueError(f"Cabeçalho de {arq} difere do primeiro arquivo.")
+                for linha in leitor:
+                    if row_filter is not None and not row_filter(dict(zip(cabecalho, linha))):
+                        continue
+                    escritor.writerow(linha if indices is None else [linha[i] for i in indices])
+
+
+def merge_csv_files(arquivos, output_file, check_headers=True, columns=None, row_filter=None):
+    """
+    Concatena CSVs com o mesmo cabeçalho em um único arquivo.
+
+    Sem projeção nem filtro, nenhuma linha é interpretada: o cabeçalho de cada
+    arquivo é lido uma vez e o corpo é copiado como bytes (no kernel, via
+    `os.copy_file_range`/`os.sendfile`, quando possível), preservando o conteúdo
+    original. Só com `columns` ou `row_filter` as linhas passam pelo módulo csv.
+
+    Parâmetros:
+    - arquivos: lista de caminhos dos CSVs, na ordem de concatenação
+    - output_file: caminho do CSV de saída
+    - check_headers: se True, exige que todos os cabeçalhos sejam iguais ao do primeiro arquivo
+    - columns: lista de colunas a manter (opcional)
+    - row_filter: função que recebe a linha como dicionário {coluna: valor} e retorna
+      se ela deve ser mantida (opcional)
+
+    Resultado:
+    - Gera o CSV concatenado em 'output_file'
+    """
+    if columns is None and row_filter is None:
+        _merge_bytes(arquivos, output_file, check_headers)
+    else:
+        _merge_linhas(arquivos, output_file, check_headers, columns, row_filter)
+
+
+# Linhas convertidas por vez ao gravar o formato colunar
+_LINHAS_POR_BLOCO = 1 << 16
+
+# Ordem de promoção dos tipos inferidos: int -> float -> str
+_TIPOS = ("int", "float", "str")
+
+
+def _tipo_bloco(valores):
+    """
+    Menor tipo (índice em _TIPOS) que representa todos os valores de um bloco de texto.
+    """
+    # códigos com zero à esquerda (ex.: area_fips "01000") são texto
+    if any(len(v) > 1 and v[0] == "0" and v[1] != "." for v in valores):
+        return 2
+    if "" not in valores:
+        try:
+            np.fromiter(map(int, valores), np.int64, len(valores))
+            return 0
+        except (ValueError, OverflowError):
+            pass
+    try:
+        # vazio vira NaN: exige no mínimo float
+        np.fromiter(map(float, [v or "nan" for v in valores]), np.float64, len(valores))
+        return 1
+    except ValueError:
+        return 2
+
+
+def _inferir_esquema(arquivo, columns):
+    """
+    Lê um CSV uma vez e infere o tipo de cada coluna pedida, bloco a bloco.
+
+    Retorna o cabeçalho, os índices das colunas, os tipos, o maior
+    comprimento de texto por coluna e o número de linhas.
+    """
+    with open(arquivo, "r", newline="", encoding="utf-8-sig") as f:
+        leitor = csv.reader(f)
+        cabecalho = next(leitor, None)
+        if cabecalho is None:
+            return None
+        nomes = cabecalho if columns is None else columns
+        faltando = [c for c in nomes if c not in cabecalho]
+        if faltando:
+            raise ValueError(f"Colunas inexistentes em {arquivo}: {faltando}")
+        indices = [cabecalho.index(c) for c in nomes]
+        tipos = [0] * len(indices)
+        larguras = [1] * len(indices)
+        linhas = 0
+        while True:
+            bloco = list(itertools.islice(leitor, _LINHAS_POR_BLOCO))
+            if not bloco:
+                break
+            linhas += len(bloco)
+            for j, i in enumerate(indices):
+                valores = [linha[i] for linha in bloco]
+                larguras[j] = max(larguras[j], max(map(len, valores)))
+                if tipos[j] < 2:
+                    tipos[j] = max(tipos[j], _tipo_bloco(valores))
+    return cabecalho, indices, tipos, larguras, linhas
+
+
+def _converter(valores, tipo, dtype):
+    if tipo == "int":
+        return np.fromiter(map(int, valores), np.int64, len(valores))
+    if tipo == "float":
+        return np.fromiter(map(float, [v or "nan" for v in valores]), np.float64, len(valores))
+    return np.array(valores, dtype=dtype)
+
+
+def write_columnar(arquivos, output_dir, columns=None, check_headers=True):
+    """
+    Grava os CSVs concatenados em formato colunar: um arquivo .npy por coluna e um 'schema.json'.
+
+    O esquema é inferido em uma passada por arquivo (inteiro, float ou texto,
+    com promoção entre arquivos); a segunda passada converte blocos de linhas
+    e escreve direto em arrays mapeados em disco, sem manter a
+    tabela inteira em memória. Vazios em colunas numéricas viram NaN, e
+    códigos com zero à esquerda são mantidos como texto.
+
+    Parâmetros:
+    - arquivos: lista de caminhos dos CSVs, na ordem de concatenação
+    - output_dir: pasta de saída
+    - columns: lista de colunas a gravar (todas por padrão)
+    - check_headers: se True, exige que todos os cabeçalhos sejam iguais ao do primeiro arquivo
+
+    Retorna:
+    - Dicionário do esquema gravado em 'schema.json'
+    """
+    if np is None:
+        raise ImportError("O formato colunar requer NumPy.")
+
+    esquemas = []
+    cabecalho = None
+    for arq in arquivos:
+        esquema = _inferir_esquema(arq, columns)
+        if esquema is None:
+            continue
+        if cabecalho is None:
+            cabecalho = esquema[0]
+        elif check_headers and esquema[0] != cabecalho:
+            raise ValueError(f"Cabeçalho de {arq} difere do primeiro arquivo.")
+        esquemas.append((arq, esquema))
+    if cabecalho is None:
+        raise ValueError("Nenhum arquivo com dados para gravar.")
+
+    nomes = cabecalho if columns is None else list(columns)
+    tipos = [_TIPOS[max(e[2][j] for _, e in esquemas)] for j in range(len(nomes))]
+    larguras = [max(e[3][j] for _, e in esquemas) for j in range(len(nomes))]
+    dtypes = [{"int": "<i8", "float": "<f8"}.get(t, f"<U{w}") for t, w in zip(tipos, larguras)]
+    total = sum(e[4] for _, e in esquemas)
+
+    os.makedirs(output_dir, exist_ok=True)
+    saidas = [
+        np.lib.format.open_memmap(os.path.join(output_dir, f"col{j}.npy"), mode="w+",
+                                  dtype=dtypes[j], shape=(total,))
+        for j in range(len(nomes))
+    ]
+    pos = 0
+    for arq, (_, indices, _, _, _) in esquemas:
+        with open(arq, "r", newline="", encoding="utf-8-sig") as f:
+            leitor = csv.reader(f)
+            next(leitor)
+            while True:
+                bloco = list(itertools.islice(leitor, _LINHAS_POR_BLOCO))
+                if not bloco:
+                    break
+                for j, i in enumerate(indices):
+                    saidas[j][pos:pos + len(bloco)] = _converter([linha[i] for linha in bloco],
+                                                                 tipos[j], dtypes[j])
+                pos += len(bloco)
+    for saida in saidas:
+        saida.flush()
+    del saidas
+
+    esquema = {
+        "linhas": total,
+        "fontes": [arq for arq, _ in esquemas],
+        "colunas": [{"nome": n, "tipo": t, "dtype": d, "arquivo": f"col{j}.npy"}
+                    for j, (n, t, d) in enumerate(zip(nomes, tipos, dtypes))],
+    }
+    with open(os.path.join(output_dir, "schema.json"), "w", encoding="utf-8") as f:
+        json.dump(esquema, f, indent=1, ensure_ascii=False)
+    return esquema
+
+
+def load_columnar(output_dir, columns=None):
+    """
+    Carrega colunas gravadas por `write_columnar` como arrays mapeados em memória.
+
+    Só os arquivos das colunas pedidas são abertos, e nenhum dado é lido
+    do disco até ser acessado.
+
+    Parâmetros:
+    - output_dir: pasta com 'schema.json' e os arquivos .npy
+    - columns: lista de colunas (todas por padrão)
+
+    Retorna:
+    - Dicionário {coluna: np.memmap somente leitura}
+    """
+    if np is None:
+        raise ImportError("O formato colunar requer NumPy.")
+    with open(os.path.join(output_dir, "schema.json"), encoding="utf-8") as f:
+        esquema = json.load(f)
+    arquivos = {c["nome"]: c["arquivo"] for c in esquema["colunas"]}
+    nomes = list(arquivos) if columns is None else columns
+    faltando = [c for c in nomes if c not in arquivos]
+    if faltando:
+        raise ValueError(f"Colunas inexistentes: {faltando}")
+    return {c: np.load(os.path.join(output_dir, arquivos[c]), mmap_mode="r") for c in nomes}
+
+
+def download_and_merge(years_quarters, output_file, data_dir="data", max_workers=8, retries=4,
+                       base_url=BLS_URL, check_headers=True, columns=None, row_filter=None, cache=None,
+                       output_format="csv"):
     """
     Faz o download de arquivos CSV do Bureau of Labor Statistics (BLS) com base em ano e trimestre,
     salva localmente na pasta 'data/' e concatena em um único CSV de saída.
 
+    Os downloads rodam em paralelo via `download_quarters`, de modo que o tempo
+    total fica próximo ao do arquivo mais lento, e não à soma de todos.
+
     Parâmetros:
     - years_quarters: lista de tuplas (ano, trimestre), por exemplo [(2024, 1), (2024, 2)]
     - output_file: caminho do arquivo CSV final mesclado
+    - data_dir: pasta onde os arquivos baixados são salvos
+    - max_workers: número máximo de downloads simultâneos
+    - retries: novas tentativas por arquivo em falhas transitórias
+    - base_url: modelo da URL com {year} e {quarter}
+    - check_headers, columns, row_filter: repassados a `merge_csv_files`
+    - cache: QuarterCache opcional, para não baixar de novo trimestres já guardados
+    - output_format: "csv" (padrão) ou "npy", que grava em 'output_file' uma pasta
+      colunar via `write_columnar` (row_filter não se aplica a esse formato)
 
     Resultado:
     - Gera arquivo CSV com os dados concatenados em 'output_file'
     """
     if not isinstance(years_quarters, list) or not all(isinstance(yq, tuple) and len(yq) == 2 for yq in years_quarters):
         raise ValueError("years_quarters deve ser uma lista de tuplas (ano, trimestre)")
-        
-    caminho = os.path.abspath(sys.argv[0])
-    base_url = "https://data.bls.gov/cew/data/api/{year}/{quarter}/industry/10.csv"
-    data_dir = "data"
-    arquivos_baixados = []
+    if output_format not in ("csv", "npy"):
+        raise ValueError("output_format deve ser 'csv' ou 'npy'.")
+    if output_format == "npy" and row_filter is not None:
+        raise ValueError("row_filter só é suportado com output_format='csv'.")
 
-    # Cria diretório 'data/' se não existir
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-
-    # Baixa os arquivos CSV
-    for ano, trimestre in years_quarters:
-        url = base_url.format(year=ano, quarter=trimestre)
-        nome_arquivo = os.path.join(caminho, data_dir, f"{ano}_q{trimestre}.csv")
-
-        try:
-            print(f"Baixando {url}...")
-            urllib.request.urlretrieve(url, nome_arquivo)
-            arquivos_baixados.append(nome_arquivo)
-        except Exception as e:
-            print(f"Erro ao baixar {url}: {e}")
+    print(f"Baixando {len(years_quarters)} arquivos com até {max_workers} conexões...")
+    baixados, erros = download_quarters(years_quarters, data_dir, max_workers=max_workers,
+                                        retries=retries, base_url=base_url, cache=cache)
+    for mensagem in erros.values():
+        print(mensagem)
 
     # Ordena os arquivos por nome
-    arquivos_baixados.sort()
+    arquivos_baixados = sorted(baixados.values())
 
     # Merge dos CSVs
-    with open(output_file, "w", newline="", encoding="utf-8") as outfile:
-        escritor = None
-        for arq in arquivos_baixados:
-            with open(arq, "r", encoding="utf-8") as infile:
-                leitor = csv.reader(infile)
-                cabecalho = next(leitor)
-                if escritor is None:
-                    escritor = csv.writer(outfile)
-                    escritor.writerow(cabecalho)
-                for linha in leitor:
-                    escritor.writerow(linha)
-            
+    if output_format == "npy":
+        write_columnar(arquivos_baixados, output_file, columns=columns, check_headers=check_headers)
+    else:
+        merge_csv_files(arquivos_baixados, output_file, check_headers=check_headers,
+                        columns=columns, row_filter=row_filter)
     print(f"Arquivo mesclado salvo como: {output_file}")
 
 # Teste principal
@@ -0,0 +1,176 @@
+"""
+Testes do download de trimestres do BLS contra um servidor HTTP local.
+
+O servidor imita o do BLS: serve CSVs com ETag, aceita Range/If-Range e pode
+ser configurado para falhar com 5xx, cortar a conexão no meio do corpo,
+redirecionar ou trocar o conteúdo entre requisições.
+"""
+
+import importlib.util
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+_CAMINHO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Lista 2 - Programação.py")
+_spec = importlib.util.spec_from_file_location("lista2", _CAMINHO)
+lista2 = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(lista2)
+
+
+class _Servidor:
+    """
+    Estado compartilhado com o handler: arquivos, falhas programadas e requisições recebidas.
+    """
+
+    def __init__(self):
+        self.arquivos = {}
+        self.falhas_5xx = {}
+        self.cortes = {}
+        self.redirecionamentos = {}
+        self.requisicoes = []
+        self.lock = threading.Lock()
+
+    def publicar(self, caminho, conteudo, versao="v1"):
+        self.arquivos[caminho] = (conteudo, f'"{versao}"')
+
+
+def _handler(estado):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with estado.lock:
+                estado.requisicoes.append((self.path, dict(self.headers)))
+                if self.path in estado.redirecionamentos:
+                    self.send_response(302)
+                    self.send_header("Location", estado.redirecionamentos[self.path])
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if estado.falhas_5xx.get(self.path, 0) > 0:
+                    estado.falhas_5xx[self.path] -= 1
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                conteudo, etag = estado.arquivos[self.path]
+                corte = estado.cortes.pop(self.path, None)
+
+            faixa = self.headers.get("Range")
+            if_range = self.headers.get("If-Range")
+            inicio = 0
+            if faixa and (if_range is None or if_range == etag):
+                inicio = int(faixa.split("=")[1].split("-")[0])
+                corpo = conteudo[inicio:]
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {inicio}-{len(conteudo) - 1}/{len(conteudo)}")
+            else:
+                corpo = conteudo
+                self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(corpo)))
+            if corte is not None:
+                self.send_header("Connection", "close")
+            self.end_headers()
+            if corte is not None:
+                # envia só parte do corpo e fecha, como uma conexão que caiu
+                self.wfile.write(corpo[:corte])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(corpo)
+    return Handler
+
+
+@pytest.fixture
+def servidor():
+    estado = _Servidor()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler(estado))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    estado.base = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield estado
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _csv(ano, trimestre, linhas=2000):
+    return ("area,valor\r\n" + "".join(f"{ano}{trimestre},{i}\r\n" for i in range(linhas))).encode()
+
+
+def test_download_paralelo(servidor, tmp_path):
+    trimestres = [(ano, t) for ano in (2022, 2023) for t in (1, 2, 3, 4)]
+    for ano, t in trimestres:
+        servidor.publicar(f"/{ano}/{t}.csv", _csv(ano, t))
+
+    baixados, erros = lista2.download_quarters(trimestres, data_dir=str(tmp_path), max_workers=4,
+                                               base_url=servidor.base + "/{year}/{quarter}.csv")
+    assert erros == {}
+    assert set(baixados) == set(trimestres)
+    for (ano, t), caminho in baixados.items():
+        with open(caminho, "rb") as f:
+            assert f.read() == _csv(ano, t)
+
+
+def test_retentativa_em_5xx(servidor, tmp_path):
+    servidor.publicar("/2023/1.csv", _csv(2023, 1))
+    servidor.falhas_5xx["/2023/1.csv"] = 2
+
+    baixados, erros = lista2.download_quarters([(2023, 1)], data_dir=str(tmp_path), retries=3,
+                                               backoff=0.01,
+                                               base_url=servidor.base + "/{year}/{quarter}.csv")
+    assert erros == {}
+    with open(baixados[(2023, 1)], "rb") as f:
+        assert f.read() == _csv(2023, 1)
+    assert len(servidor.requisicoes) == 3
+
+
+def test_retomada_com_range(servidor, tmp_path):
+    conteudo = _csv(2023, 2)
+    servidor.publicar("/2023/2.csv", conteudo)
+    servidor.cortes["/2023/2.csv"] = len(conteudo) // 3
+
+    destino = str(tmp_path / "2023_q2.csv")
+    lista2._baixar_com_retentativas(servidor.base + "/2023/2.csv", destino, retries=2,
+                                    backoff=0.01, timeout=5)
+    with open(destino, "rb") as f:
+        assert f.read() == conteudo
+    _, cabecalhos = servidor.requisicoes[-1]
+    assert cabecalhos["Range"] == f"bytes={len(conteudo) // 3}-"
+    assert cabecalhos["If-Range"] == '"v1"'
+    assert not os.path.exists(destino + ".part")
+    assert not os.path.exists(destino + ".part.json")
+
+
+def test_retomada_descarta_parcial_de_outra_versao(servidor, tmp_path):
+    antigo = _csv(2023, 3)
+    servidor.publicar("/2023/3.csv", antigo, versao="v1")
+    servidor.cortes["/2023/3.csv"] = len(antigo) // 2
+    destino = str(tmp_path / "2023_q3.csv")
+    with pytest.raises(lista2._ErroTransitorio):
+        lista2._baixar_uma_vez(servidor.base + "/2023/3.csv", destino, timeout=5)
+    assert os.path.getsize(destino + ".part") == len(antigo) // 2
+
+    # o arquivo é revisado antes da retomada: If-Range não bate e vem o conteúdo inteiro
+    novo = _csv(2023, 3, linhas=2500).replace(b"20233,", b"20233r,")
+    servidor.publicar("/2023/3.csv", novo, versao="v2")
+    validadores = lista2._baixar_uma_vez(servidor.base + "/2023/3.csv", destino, timeout=5)
+    with open(destino, "rb") as f:
+        assert f.read() == novo
+    assert validadores["etag"] == '"v2"'
+
+
+def test_segue_redirecionamento(servidor, tmp_path):
+    servidor.publicar("/novo/2023/4.csv", _csv(2023, 4))
+    servidor.redirecionamentos["/2023/4.csv"] = "/novo/2023/4.csv"
+
+    baixados, erros = lista2.download_quarters([(2023, 4)], data_dir=str(tmp_path),
+                                               base_url=servidor.base + "/{year}/{quarter}.csv")
+    assert erros == {}
+    with open(baixados[(2023, 4)], "rb") as f:
+        assert f.read() == _csv(2023, 4)
@@ -5,15 +5,24 @@ Parte 3: Filtragem e Picos
 """
 
 import numpy as np
-from typing import Tuple
+from typing import Any, Iterable, Iterator, Optional, Tuple
 
-def replace_negatives(v: np.ndarray, new_value: float) -> np.ndarray:
+def replace_negatives(v: np.ndarray, new_value: float, inplace: bool = False,
+                      out: Optional[np.ndarray] = None) -> np.ndarray:
     """
     Substitui os valores negativos em um vetor por um novo valor.
+
+    Por padrão devolve uma cópia; com `inplace=True` altera `v` diretamente e,
+    com `out`, escreve o resultado no buffer informado.
     """
-    v_copy = v.copy()
-    v_copy[v_copy < 0] = new_value
-    return v_copy
+    if inplace:
+        out = v
+    elif out is None:
+        out = v.copy()
+    else:
+        np.copyto(out, v)
+    out[out < 0] = new_value
+    return out
 
 def local_peaks(series: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     """
@@ -26,3 +35,298 @@ def local_peaks(series: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
             indices.append(t)
             peaks.append(series[t])
     return np.array(indices), np.array(peaks)
+
+def _runs(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Comprime uma série 1-D em sequências de valores iguais: (inícios, fins, valores).
+    """
+    n = len(x)
+    if n == 0:
+        vazio = np.zeros(0, dtype=np.intp)
+        return vazio, vazio, x[:0]
+    novo = np.empty(n, dtype=bool)
+    novo[0] = True
+    np.not_equal(x[1:], x[:-1], out=novo[1:])
+    starts = np.flatnonzero(novo)
+    ends = np.empty_like(starts)
+    ends[:-1] = starts[1:] - 1
+    ends[-1] = n - 1
+    return starts, ends, x[starts]
+
+def _picos_runs(starts: np.ndarray, ends: np.ndarray, vals: np.ndarray,
+                plateaus: bool) -> np.ndarray:
+    """
+    Máscara das sequências que são máximos locais (maiores que as vizinhas).
+    """
+    m = np.zeros(len(vals), dtype=bool)
+    if len(vals) >= 3:
+        m[1:-1] = (vals[1:-1] > vals[:-2]) & (vals[1:-1] > vals[2:])
+    if not plateaus:
+        m &= starts == ends
+    return m
+
+def _anterior_maior(r: np.ndarray, q: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """
+    Para cada consulta i, a maior posição j < q[i] com r[j] >= t[i] (-1 se não houver).
+
+    `r` são postos inteiros dos valores. Entre dois máximos locais
+    consecutivos (>= vizinho esquerdo, > vizinho direito) a sequência desce e
+    depois sobe, então a resposta está no ponto de partida, no trecho
+    descendente logo após o máximo anterior (busca binária) ou, se esse
+    máximo não passar do limiar, à direita de um máximo mais alto, encontrado
+    recursivamente na sequência dos máximos, que tem no máximo metade do tamanho.
+    """
+    res = np.full(len(q), -1, dtype=np.intp)
+    n = len(r)
+    if n == 0 or len(q) == 0:
+        return res
+    p = q - 1
+    valido = p >= 0
+    no_inicio = valido & (r[np.maximum(p, 0)] >= t)
+    res[no_inicio] = p[no_inicio]
+    pend = np.flatnonzero(valido & ~no_inicio)
+    if len(pend) == 0 or n == 1:
+        return res
+
+    m = np.ones(n, dtype=bool)
+    m[1:] &= r[1:] >= r[:-1]
+    m[:-1] &= r[:-1] > r[1:]
+    M = np.flatnonzero(m)
+
+    # trecho não crescente após cada máximo, limitado pelo próximo máximo
+    sobe = np.append(np.flatnonzero(r[1:] > r[:-1]) + 1, n)
+    fim = np.minimum(sobe[np.searchsorted(sobe, M, side="right")], np.append(M[1:], n))
+    tam = fim - M - 1
+    inicio = np.zeros(len(M), dtype=np.intp)
+    np.cumsum(tam[:-1], out=inicio[1:])
+    pos = np.arange(tam.sum()) - np.repeat(inicio - M - 1, tam)
+    # chave crescente dentro de cada trecho: (máximo, -posto)
+    base = int(r.max()) + 2
+    chave = np.repeat(np.arange(len(M), dtype=np.int64), tam) * base + (base - 1 - r[pos])
+
+    def resolver(k: np.ndarray, lim: np.ndarray) -> np.ndarray:
+        # último ponto >= lim no trecho que começa no máximo k (que já é >= lim)
+        n_acima = np.searchsorted(chave, k * base + (base - 1 - lim), side="right") - inicio[k]
+        return M[k] + n_acima
+
+    k = np.searchsorted(M, p[pend], side="right") - 1
+    # antes do primeiro máximo a sequência não decresce: nada acima do ponto de partida
+    tem = k >= 0
+    pend, k, lim = pend[tem], k[tem], t[pend[tem]]
+    acima = r[M[k]] >= lim
+    res[pend[acima]] = resolver(k[acima], lim[acima])
+    resto = ~acima
+    kk = _anterior_maior(r[M], k[resto], lim[resto])
+    achou = kk >= 0
+    res[pend[resto][achou]] = resolver(kk[achou], lim[resto][achou])
+    return res
+
+def _proeminencias(x: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """
+    Proeminência de cada pico: altura acima do maior dos dois vales que o separam de um ponto mais alto.
+
+    A busca pelo ponto mais alto à esquerda/direita só precisa percorrer os
+    máximos locais por sequência (e as bordas), pois a subida a partir de
+    qualquer ponto mais alto termina em um deles; ela é feita para todos os
+    picos de uma vez por `_anterior_maior`.
+    """
+    if len(idx) == 0:
+        return np.zeros(0, dtype=x.dtype)
+    starts, ends, vals = _runs(x)
+    cand = np.zeros(len(vals), dtype=bool)
+    cand[[0, -1]] = True
+    cand |= _picos_runs(starts, ends, vals, plateaus=True)
+    c_runs = np.flatnonzero(cand)
+    c_vals = vals[c_runs]
+    # posição de cada pico dentro da lista de candidatos
+    pos = np.searchsorted(starts[c_runs], idx, side="right") - 1
+
+    # postos densos: valores iguais têm o mesmo posto
+    ordem = np.argsort(c_vals, kind="stable")
+    ordenados = c_vals[ordem]
+    postos = np.empty(len(c_vals), dtype=np.intp)
+    postos[ordem] = np.cumsum(np.append(True, ordenados[1:] != ordenados[:-1])) - 1
+    # "estritamente maior que o pico" em postos
+    limiar = postos[pos] + 1
+    n_c = len(c_vals)
+
+    esq = _anterior_maior(postos, pos, limiar)
+    dir_rev = _anterior_maior(postos[::-1].copy(), n_c - 1 - pos, limiar)
+    dir_ = np.where(dir_rev >= 0, n_c - 1 - dir_rev, -1)
+
+    # menor valor entre cada par de candidatos vizinhos (intervalos disjuntos);
+    # a base de cada lado é o mínimo desses vales até o ponto mais alto
+    vales = np.append(np.minimum.reduceat(vals, c_runs)[:-1], np.inf)
+    vales[:-1] = np.minimum(vales[:-1], vals[c_runs[1:]])
+    vazio = n_c - 1
+    lo_esq = np.where(pos > 0, np.maximum(esq, 0), vazio)
+    hi_esq = np.where(pos > 0, pos, vazio + 1)
+    hi_dir = np.where(dir_ >= 0, dir_, n_c - 1)
+    tem_dir = hi_dir > pos
+    min_esq = _reduzir_janelas(vales, lo_esq, hi_esq, np.minimum)
+    min_dir = _reduzir_janelas(vales, np.where(tem_dir, pos, vazio), np.where(tem_dir, hi_dir, vazio + 1),
+                               np.minimum)
+    alturas = x[idx]
+    return alturas - np.maximum(np.minimum(min_esq, alturas), np.minimum(min_dir, alturas))
+
+def _reduzir_janelas(v: np.ndarray, lo: np.ndarray, hi: np.ndarray,
+                     op: np.ufunc = np.maximum) -> np.ndarray:
+    """
+    Aplica `op` (máximo ou mínimo) a v[lo[i]:hi[i]] para cada i (janelas não vazias), por tabela esparsa.
+
+    Os níveis da tabela são gerados um a um e cada janela é respondida no nível
+    floor(log2(tamanho)), com dois blocos sobrepostos; só dois níveis ficam em memória.
+    """
+    tam = hi - lo
+    nivel_q = np.log2(tam).astype(np.intp)
+    res = np.empty(len(lo), dtype=v.dtype)
+    if len(lo) == 0:
+        return res
+    tabela = v
+    for nivel in range(int(nivel_q.max()) + 1):
+        if nivel:
+            meio = 1 << (nivel - 1)
+            tabela = op(tabela[:-meio], tabela[meio:])
+        sel = np.flatnonzero(nivel_q == nivel)
+        if len(sel):
+            res[sel] = op(tabela[lo[sel]], tabela[hi[sel] - (1 << nivel)])
+    return res
+
+def _filtrar_distancia(idx: np.ndarray, alturas: np.ndarray, distance: int) -> np.ndarray:
+    """
+    Mantém os picos mais altos, descartando os que estão a menos de `distance` amostras de um pico mantido.
+
+    Em caso de empate na altura, o pico mais à esquerda tem prioridade. O
+    resultado é o do algoritmo guloso por altura, obtido em rodadas
+    vetorizadas: um pico ainda indefinido que é o de maior prioridade entre os
+    indefinidos da sua janela certamente fica, e os indefinidos a menos de
+    `distance` dele caem. Se uma rodada decide poucos picos (cadeias de alturas
+    monotônicas), o restante segue pelo laço guloso direto.
+    """
+    n = len(idx)
+    manter = np.zeros(n, dtype=bool)
+    if n == 0:
+        return manter
+    prioridade = np.empty(n, dtype=np.intp)
+    prioridade[np.lexsort((idx, -alturas))] = np.arange(n, 0, -1)
+    lo = np.searchsorted(idx, idx - (distance - 1), side="left")
+    hi = np.searchsorted(idx, idx + distance, side="left")
+    vivos = np.arange(n)
+    while len(vivos):
+        p_viva = np.zeros(n, dtype=np.intp)
+        p_viva[vivos] = prioridade[vivos]
+        novos = vivos[_reduzir_janelas(p_viva, lo[vivos], hi[vivos]) == prioridade[vivos]]
+        manter[novos] = True
+        # vivos restantes a menos de `distance` de um pico novo caem
+        resto = vivos[~manter[vivos]]
+        pos_novos = idx[novos]
+        j = np.searchsorted(pos_novos, idx[resto])
+        perto_dir = (j < len(novos)) & (pos_novos[np.minimum(j, len(novos) - 1)] - idx[resto] < distance)
+        perto_esq = (j > 0) & (idx[resto] - pos_novos[np.maximum(j - 1, 0)] < distance)
+        decididos = len(vivos) - len(resto) + np.count_nonzero(perto_dir | perto_esq)
+        vivos = resto[~(perto_dir | perto_esq)]
+        if decididos * 8 < len(vivos):
+            break
+    # laço guloso para o que sobrou: picos vivos não estão perto de nenhum pico mantido
+    descartado = np.zeros(n, dtype=bool)
+    for i in vivos[np.lexsort((idx[vivos], -alturas[vivos]))]:
+        if descartado[i]:
+            continue
+        manter[i] = True
+        descartado[lo[i]:hi[i]] = True
+    return manter
+
+def _local_peaks_1d(x: np.ndarray, plateaus: bool, prominence: Optional[float],
+                    distance: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    if plateaus:
+        starts, ends, vals = _runs(x)
+        m = _picos_runs(starts, ends, vals, plateaus=True)
+        idx = (starts[m] + ends[m]) // 2
+    else:
+        mask = np.zeros(len(x), dtype=bool)
+        if len(x) >= 3:
+            mask[1:-1] = (x[1:-1] > x[:-2]) & (x[1:-1] > x[2:])
+        idx = np.flatnonzero(mask)
+    if distance is not None and distance > 1:
+        idx = idx[_filtrar_distancia(idx, x[idx], distance)]
+    if prominence is not None:
+        idx = idx[_proeminencias(x, idx) >= prominence]
+    return idx, x[idx]
+
+def local_peaks_vetorizado(series: np.ndarray, axis: int = -1, plateaus: bool = False,
+                           prominence: Optional[float] = None,
+                           distance: Optional[int] = None) -> Tuple[Any, np.ndarray]:
+    """
+    Versão vetorizada de `local_peaks`, comparando cada ponto com os vizinhos.
+
+    Com `plateaus=True`, sequências de valores iguais mais altas que as vizinhas
+    contam como um pico no seu ponto central. `distance` descarta picos a menos
+    de `distance` amostras de um pico mais alto, e `prominence` exige uma
+    proeminência mínima. Para séries 1-D retorna (índices, picos) como
+    `local_peaks`; para lotes N-D, os índices vêm como a tupla de `np.nonzero`.
+    """
+    x = np.asarray(series)
+    if x.ndim == 1:
+        return _local_peaks_1d(x, plateaus, prominence, distance)
+    x = np.moveaxis(x, axis, -1)
+    if not plateaus and prominence is None and distance is None:
+        mask = np.zeros(x.shape, dtype=bool)
+        if x.shape[-1] >= 3:
+            mask[..., 1:-1] = (x[..., 1:-1] > x[..., :-2]) & (x[..., 1:-1] > x[..., 2:])
+    else:
+        mask = np.zeros(x.shape, dtype=bool)
+        for pos in np.ndindex(x.shape[:-1]):
+            idx, _ = _local_peaks_1d(x[pos], plateaus, prominence, distance)
+            mask[pos][idx] = True
+    # índices e valores na ordem do array original, não na do eixo movido
+    m = np.moveaxis(mask, -1, axis)
+    return np.nonzero(m), np.asarray(series)[m]
+
+class DetectorPicos:
+    """
+    Detector de picos incremental: cada `push(chunk)` devolve (índices globais, picos) do bloco.
+
+    Entre blocos são carregadas apenas as duas últimas sequências de valores
+    iguais: a última, ainda indefinida, e a anterior como contexto à esquerda.
+    Assim picos na fronteira entre blocos são reportados uma única vez, no
+    bloco em que o vizinho à direita chega.
+    """
+
+    def __init__(self, plateaus: bool = False):
+        self.plateaus = plateaus
+        self._starts = self._ends = np.zeros(0, dtype=np.intp)
+        self._vals = None
+        self._offset = 0
+
+    def push(self, chunk: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        chunk = np.asarray(chunk)
+        s, e, v = _runs(chunk)
+        if self._vals is None:
+            self._vals = v[:0].copy()
+        if len(chunk) == 0:
+            return s, v
+        s = s + self._offset
+        e = e + self._offset
+        self._offset += len(chunk)
+        starts, ends, vals = self._starts, self._ends, self._vals
+        if len(vals) and vals[-1] == v[0]:
+            s[0] = starts[-1]
+            starts, ends, vals = starts[:-1], ends[:-1], vals[:-1]
+        starts = np.concatenate([starts, s])
+        ends = np.concatenate([ends, e])
+        vals = np.concatenate([vals, v])
+        m = _picos_runs(starts, ends, vals, self.plateaus)
+        self._starts, self._ends, self._vals = starts[-2:], ends[-2:], vals[-2:]
+        return (starts[m] + ends[m]) // 2, vals[m]
+
+def local_peaks_stream(chunks: Iterable[np.ndarray],
+                       plateaus: bool = False) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Detecta picos em uma série recebida em blocos, devolvendo (índices globais, picos) por bloco.
+
+    Ver `DetectorPicos` para o tratamento das fronteiras entre blocos.
+    """
+    detector = DetectorPicos(plateaus)
+    for chunk in chunks:
+        if len(chunk):
+            yield detector.push(chunk)
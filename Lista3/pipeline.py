@@ -0,0 +1,162 @@
+"""
+pipeline.py
+
+Encadeamento das funções da Lista 3 em uma única passada por blocos
+"""
+
+import numpy as np
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+from filters import DetectorPicos, replace_negatives
+from simulations import _dtype_float, _retornos_em, rolling_std_lote
+
+class _SubstituirNegativos:
+    def __init__(self, new_value: float):
+        self.new_value = new_value
+
+    def processar(self, bloco: np.ndarray) -> np.ndarray:
+        return replace_negatives(bloco, self.new_value, inplace=True)
+
+class _Retornos:
+    def __init__(self, tipo: str):
+        if tipo not in ("simples", "log"):
+            raise ValueError("tipo deve ser 'simples' ou 'log'.")
+        self.tipo = tipo
+        self._anterior = None
+        self._buffer = np.zeros(0)
+
+    def processar(self, bloco: np.ndarray) -> np.ndarray:
+        if len(bloco) == 0:
+            return bloco
+        if len(self._buffer) < len(bloco) or self._buffer.dtype != _dtype_float(bloco):
+            self._buffer = np.empty(len(bloco), dtype=_dtype_float(bloco))
+        if self._anterior is None:
+            out = self._buffer[:len(bloco) - 1]
+            _retornos_em(bloco[:-1], bloco[1:], out, self.tipo)
+        else:
+            out = self._buffer[:len(bloco)]
+            _retornos_em(self._anterior, bloco[:1], out[:1], self.tipo)
+            _retornos_em(bloco[:-1], bloco[1:], out[1:], self.tipo)
+        self._anterior = bloco[-1:].copy()
+        return out
+
+class _RollingStd:
+    def __init__(self, window: int, days_size: int):
+        if window <= 0:
+            raise ValueError("window deve ser positivo.")
+        self.window = window
+        self.days_size = days_size
+        self._hist = np.zeros(0)
+        self._n_hist = 0
+
+    def processar(self, bloco: np.ndarray) -> np.ndarray:
+        # janela anterior (até window - 1 pontos) seguida do bloco novo
+        total = self._n_hist + len(bloco)
+        if len(self._hist) < total:
+            novo = np.empty(total, dtype=_dtype_float(bloco))
+            novo[:self._n_hist] = self._hist[:self._n_hist]
+            self._hist = novo
+        self._hist[self._n_hist:total] = bloco
+        resultado = rolling_std_lote(self._hist[:total], self.window, self.days_size)
+        manter = min(self.window - 1, total)
+        self._hist[:manter] = self._hist[total - manter:total]
+        self._n_hist = manter
+        return resultado
+
+class _Picos:
+    def __init__(self, plateaus: bool):
+        self._detector = DetectorPicos(plateaus)
+
+    def processar(self, bloco: np.ndarray):
+        return self._detector.push(bloco)
+
+class Pipeline:
+    """
+    Encadeia `replace_negatives`, retornos, `rolling_std` e detecção de picos em uma só passada.
+
+    As etapas são declaradas em cadeia e executadas bloco a bloco: cada
+    bloco atravessa todas as etapas antes do próximo ser lido, e cada etapa
+    carrega apenas o estado necessário entre blocos (último preço, últimos
+    window - 1 retornos, última sequência candidata a pico). O número de
+    buffers é constante, de tamanho proporcional a `chunk_size`.
+
+        Pipeline().substituir_negativos(0.01).retornos("log").rolling_std(21).picos()
+    """
+
+    def __init__(self):
+        self._fabricas: List[Callable[[], Any]] = []
+        self._termina_em_picos = False
+
+    def _adicionar(self, fabrica: Callable[[], Any]) -> "Pipeline":
+        if self._termina_em_picos:
+            raise ValueError("A detecção de picos deve ser a última etapa.")
+        self._fabricas.append(fabrica)
+        return self
+
+    def substituir_negativos(self, new_value: float) -> "Pipeline":
+        return self._adicionar(lambda: _SubstituirNegativos(new_value))
+
+    def retornos(self, tipo: str = "log") -> "Pipeline":
+        return self._adicionar(lambda: _Retornos(tipo))
+
+    def rolling_std(self, window: int, days_size: int = 0) -> "Pipeline":
+        return self._adicionar(lambda: _RollingStd(window, days_size))
+
+    def picos(self, plateaus: bool = False) -> "Pipeline":
+        self._adicionar(lambda: _Picos(plateaus))
+        self._termina_em_picos = True
+        return self
+
+    def executar_stream(self, chunks: Iterable[np.ndarray], inplace: bool = False) -> Iterator[Any]:
+        """
+        Processa os blocos em sequência, devolvendo a saída da última etapa para cada um.
+
+        Sem `inplace`, cada bloco é copiado para um buffer de trabalho
+        reutilizado; com `inplace=True` as etapas que alteram valores
+        (`substituir_negativos`) escrevem diretamente nos blocos recebidos.
+        As saídas são views de buffers internos, válidas até o próximo bloco.
+        """
+        etapas = [fabrica() for fabrica in self._fabricas]
+        trabalho = np.zeros(0)
+        for chunk in chunks:
+            if inplace:
+                bloco = chunk
+            else:
+                if len(trabalho) < len(chunk):
+                    trabalho = np.empty(len(chunk), dtype=_dtype_float(chunk))
+                bloco = trabalho[:len(chunk)]
+                bloco[:] = chunk
+            for etapa in etapas:
+                bloco = etapa.processar(bloco)
+            yield bloco
+
+    def executar(self, prices: np.ndarray, chunk_size: int = 1 << 16, inplace: bool = False,
+                 out: Optional[np.ndarray] = None) -> Any:
+        """
+        Executa o pipeline sobre uma série inteira (array ou `np.memmap`), bloco a bloco.
+
+        Se a última etapa for `picos`, devolve (índices, picos) relativos à
+        série que chega a essa etapa; caso contrário devolve a série final,
+        escrita em `out` quando informado.
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size deve ser positivo.")
+        chunks = (prices[i:i + chunk_size] for i in range(0, len(prices), chunk_size))
+        saidas = self.executar_stream(chunks, inplace=inplace)
+        if self._termina_em_picos:
+            pares = list(saidas)
+            indices = [i for i, _ in pares]
+            picos = [p for _, p in pares]
+            if not pares:
+                return np.zeros(0, dtype=np.intp), np.zeros(0)
+            return np.concatenate(indices), np.concatenate(picos)
+        if out is None:
+            partes = [s.copy() for s in saidas]
+            return np.concatenate(partes) if partes else np.zeros(0)
+        pos = 0
+        for s in saidas:
+            out[pos:pos + len(s)] = s
+            pos += len(s)
+        if pos != len(out):
+            raise ValueError("out não tem o tamanho da saída do pipeline.")
+        return out
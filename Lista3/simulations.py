@@ -5,8 +5,21 @@ Parte 1: Simulação de Preços e Análise de Retornos
 """
 
 import numpy as np
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Iterator, Optional, Union
 
-def simular_precos(S0: float, sigma: float, days: int) -> np.ndarray:
+def _dtype_float(x: np.ndarray, dtype=None) -> np.dtype:
+    """
+    Tipo de ponto flutuante do resultado: `dtype` se informado, senão o da entrada (inteiros viram float64).
+    """
+    if dtype is not None:
+        return np.dtype(dtype)
+    return np.result_type(np.asarray(x).dtype, np.float32)
+
+def simular_precos(S0: float, sigma: float, days: int, dtype=np.float64) -> np.ndarray:
     """
     Gera uma série temporal de preços com ruído gaussiano.
     """
@@ -14,7 +27,138 @@ def simular_precos(S0: float, sigma: float, days: int) -> np.ndarray:
     for _ in range(days):
         preco = precos[-1] + np.random.normal(0, sigma)
         precos.append(preco)
-    return np.array(precos)
+    return np.array(precos, dtype=dtype)
+
+def _bloco_precos(S0: float, sigma: float, days: int, linhas: int,
+                  rng: np.random.Generator, dtype=np.float64, mu: float = 0.0,
+                  modelo: str = "aditivo", out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Gera um bloco (linhas, days + 1) de trajetórias: ruídos em lote + soma acumulada.
+
+    No modelo "multiplicativo" (o de `simulate_stock_price` da Lista 2) os
+    ruídos são retornos diários e a trajetória é S0 * prod(1 + r).
+    """
+    precos = np.empty((linhas, days + 1), dtype=dtype) if out is None else out
+    precos[:, 0] = S0
+    ruido = rng.standard_normal(size=(linhas, days), dtype=dtype)
+    ruido *= sigma
+    if mu:
+        ruido += mu
+    if modelo == "multiplicativo":
+        ruido += 1
+        np.cumprod(ruido, axis=1, out=precos[:, 1:])
+        precos[:, 1:] *= S0
+    else:
+        np.cumsum(ruido, axis=1, out=precos[:, 1:])
+        precos[:, 1:] += S0
+    return precos
+
+def simular_precos_lote(S0: float, sigma: float, days: int, n_paths: int,
+                        rng: Optional[np.random.Generator] = None,
+                        dtype=np.float64) -> np.ndarray:
+    """
+    Gera `n_paths` trajetórias de preços de uma só vez, em uma matriz (n_paths, days + 1).
+
+    Com `dtype=np.float32` os ruídos são sorteados e acumulados em float32,
+    usando metade da memória. Cada soma acumulada arredonda com erro relativo
+    de até 2**-24 (~6e-8), então o erro absoluto de um preço após `days` dias
+    fica limitado por cerca de days * 6e-8 * max|preço| (tipicamente
+    proporcional a sqrt(days)); para S0=100 e 252 dias, da ordem de 1e-4.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    return _bloco_precos(S0, sigma, days, n_paths, rng, dtype)
+
+def simular_precos_chunks(S0: float, sigma: float, days: int, n_paths: int,
+                          chunk_size: int,
+                          rng: Optional[np.random.Generator] = None,
+                          dtype=np.float64) -> Iterator[np.ndarray]:
+    """
+    Gera trajetórias de preços em blocos de até `chunk_size` trajetórias.
+
+    Os blocos consomem o mesmo gerador em sequência, então concatená-los
+    reproduz exatamente `simular_precos_lote` com a mesma semente, mantendo
+    a memória limitada ao tamanho de um bloco.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size deve ser positivo.")
+    if rng is None:
+        rng = np.random.default_rng()
+    for inicio in range(0, n_paths, chunk_size):
+        yield _bloco_precos(S0, sigma, days, min(chunk_size, n_paths - inicio), rng, dtype)
+
+def _preencher_bloco_shm(nome: str, shape, dtype: str, inicio: int, fim: int,
+                        semente: np.random.SeedSequence, S0: float, sigma: float,
+                        mu: float, modelo: str) -> None:
+    """
+    Executada no processo trabalhador: escreve as linhas [inicio, fim) direto na memória compartilhada.
+    """
+    shm = shared_memory.SharedMemory(name=nome)
+    try:
+        precos = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        _bloco_precos(S0, sigma, shape[1] - 1, fim - inicio, np.random.default_rng(semente),
+                      dtype, mu, modelo, out=precos[inicio:fim])
+        del precos
+    finally:
+        shm.close()
+
+def _array_compartilhado(shm: shared_memory.SharedMemory, shape, dtype) -> np.ndarray:
+    """
+    Array sobre o bloco `shm` que fecha o mapeamento quando ele (e suas views) é liberado.
+    """
+    precos = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    weakref.finalize(precos, shm.close)
+    return precos
+
+def simular_precos_paralelo(S0: float, sigma: float, days: int, n_paths: int,
+                            seed: Optional[int] = None, num_workers: Optional[int] = None,
+                            paths_por_bloco: int = 10_000, mu: float = 0.0,
+                            modelo: str = "aditivo", dtype=np.float64) -> np.ndarray:
+    """
+    Simula `n_paths` trajetórias em vários processos, com fluxos aleatórios independentes.
+
+    As trajetórias são divididas em blocos fixos de `paths_por_bloco`, e cada
+    bloco usa um gerador próprio derivado de `SeedSequence(seed).spawn`. Como
+    a divisão não depende do número de processos, o resultado é idêntico bit
+    a bit para qualquer `num_workers`. Os processos escrevem seus blocos
+    direto em uma matriz `multiprocessing.shared_memory`, sem serializar
+    resultados, e essa mesma matriz é devolvida, sem cópia: o nome do bloco é
+    removido assim que os processos terminam e o mapeamento é fechado quando
+    o array retornado (e suas views) é liberado.
+    """
+    if modelo not in ("aditivo", "multiplicativo"):
+        raise ValueError("modelo deve ser 'aditivo' ou 'multiplicativo'.")
+    if paths_por_bloco <= 0:
+        raise ValueError("paths_por_bloco deve ser positivo.")
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    dtype = np.dtype(dtype)
+    shape = (n_paths, days + 1)
+    blocos = [(i, min(i + paths_por_bloco, n_paths)) for i in range(0, n_paths, paths_por_bloco)]
+    sementes = np.random.SeedSequence(seed).spawn(len(blocos))
+
+    if num_workers == 1 or len(blocos) <= 1:
+        precos = np.empty(shape, dtype=dtype)
+        for (inicio, fim), semente in zip(blocos, sementes):
+            _bloco_precos(S0, sigma, days, fim - inicio, np.random.default_rng(semente),
+                          dtype, mu, modelo, out=precos[inicio:fim])
+        return precos
+
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    try:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futuros = [executor.submit(_preencher_bloco_shm, shm.name, shape, dtype.str,
+                                       inicio, fim, semente, S0, sigma, mu, modelo)
+                       for (inicio, fim), semente in zip(blocos, sementes)]
+            for f in futuros:
+                f.result()
+        precos = _array_compartilhado(shm, shape, dtype)
+    except BaseException:
+        shm.close()
+        raise
+    finally:
+        shm.unlink()
+    return precos
 
 def calc_retornos_simples(prices: np.ndarray) -> np.ndarray:
     """
@@ -28,6 +172,59 @@ def calc_retornos_log(prices: np.ndarray) -> np.ndarray:
     """
     return np.log(prices[1:] / prices[:-1])
 
+def _retornos_em(anteriores: np.ndarray, atuais: np.ndarray, out: np.ndarray, tipo: str) -> None:
+    """
+    Escreve em `out` os retornos entre `anteriores` e `atuais`, sem arrays temporários.
+    """
+    if tipo == "log":
+        np.divide(atuais, anteriores, out=out)
+        np.log(out, out=out)
+    else:
+        np.subtract(atuais, anteriores, out=out)
+        np.divide(out, anteriores, out=out)
+
+def calc_retornos_memmap(prices: Union[np.ndarray, str, os.PathLike],
+                         output: Union[np.ndarray, str, os.PathLike],
+                         tipo: str = "simples", chunk_size: int = 1 << 20,
+                         dtype=np.float64) -> np.ndarray:
+    """
+    Calcula retornos simples ou log de uma série em disco, bloco a bloco.
+
+    `prices` pode ser um array (tipicamente um `np.memmap`) ou o caminho de um
+    arquivo binário bruto com valores `dtype`; `output` pode ser um array de
+    tamanho len(prices) - 1 ou um caminho, onde é criado um `np.memmap`. O
+    último preço de cada bloco é carregado para o próximo, de modo que a
+    memória usada depende de `chunk_size` e não do tamanho da série.
+
+    Em float32 cada retorno simples passa por duas operações arredondadas
+    (erro relativo de até 2**-23, ~1.2e-7); no log-retorno domina o
+    arredondamento da razão, com erro absoluto de até ~1.2e-7.
+    """
+    if tipo not in ("simples", "log"):
+        raise ValueError("tipo deve ser 'simples' ou 'log'.")
+    if chunk_size <= 0:
+        raise ValueError("chunk_size deve ser positivo.")
+    if not isinstance(prices, np.ndarray):
+        prices = np.memmap(prices, dtype=dtype, mode="r")
+    n = len(prices)
+    if n < 2:
+        raise ValueError("São necessários ao menos dois preços.")
+    if not isinstance(output, np.ndarray):
+        output = np.memmap(output, dtype=_dtype_float(prices), mode="w+", shape=(n - 1,))
+    elif output.shape != (n - 1,):
+        raise ValueError("output deve ter tamanho len(prices) - 1.")
+
+    anterior = None
+    for inicio in range(0, n, chunk_size):
+        bloco = np.asarray(prices[inicio:inicio + chunk_size])
+        if anterior is not None:
+            _retornos_em(anterior, bloco[:1], output[inicio - 1:inicio], tipo)
+        _retornos_em(bloco[:-1], bloco[1:], output[inicio:inicio + len(bloco) - 1], tipo)
+        anterior = bloco[-1:].copy()
+    if isinstance(output, np.memmap):
+        output.flush()
+    return output
+
 def sma(returns: np.ndarray, window: int) -> np.ndarray:
     """
     Calcula a média móvel simples (SMA).
@@ -45,3 +242,61 @@ def rolling_std(returns: np.ndarray, window: int, days_size: int = 0) -> np.ndar
         std = np.sqrt(np.sum((window_data - mean)**2) / (window - days_size))
         stds.append(std)
     return np.array(stds)
+
+# Quantidade de janelas por segmento de soma acumulada em _momentos_moveis
+_SEGMENTO = 1 << 14
+
+def _momentos_moveis(returns: np.ndarray, window: int, axis: int):
+    """
+    Média e soma dos quadrados dos desvios de cada janela, em O(n) ao longo de `axis`.
+
+    Usa somas acumuladas de x e x², reiniciadas a cada _SEGMENTO janelas e
+    com os dados de cada segmento centrados pela sua média: o erro de
+    arredondamento depende do tamanho do segmento, não do tamanho da série.
+    O acumulado é sempre feito em float64, mesmo para entradas float32.
+    Retorna os arrays com o eixo da janela na última posição.
+    """
+    if window <= 0:
+        raise ValueError("window deve ser positivo.")
+    x = np.moveaxis(np.asarray(returns, dtype=np.float64), axis, -1)
+    n_saida = max(x.shape[-1] - window + 1, 0)
+    medias = np.empty(x.shape[:-1] + (n_saida,))
+    m2 = np.empty(x.shape[:-1] + (n_saida,))
+    for ini in range(0, n_saida, _SEGMENTO):
+        fim = min(ini + _SEGMENTO, n_saida)
+        dados = x[..., ini:fim + window - 1]
+        ref = dados.mean(axis=-1, keepdims=True)
+        c = dados - ref
+        acum = np.zeros(c.shape[:-1] + (c.shape[-1] + 1,))
+        acum2 = np.zeros_like(acum)
+        np.cumsum(c, axis=-1, out=acum[..., 1:])
+        np.cumsum(c * c, axis=-1, out=acum2[..., 1:])
+        s1 = acum[..., window:] - acum[..., :-window]
+        s2 = acum2[..., window:] - acum2[..., :-window]
+        medias[..., ini:fim] = s1 / window + ref
+        m2[..., ini:fim] = s2 - s1 * s1 / window
+    np.maximum(m2, 0, out=m2)
+    return medias, m2
+
+def sma_lote(returns: np.ndarray, window: int, axis: int = -1, dtype=None) -> np.ndarray:
+    """
+    Média móvel simples em O(n) ao longo de `axis`, para uma ou várias séries.
+
+    O resultado tem o tipo da entrada (ou `dtype`); em float32 o erro relativo
+    fica na ordem de 1e-7, pois só o arredondamento final é feito em float32.
+    """
+    medias, _ = _momentos_moveis(returns, window, axis)
+    resultado = medias.astype(_dtype_float(returns, dtype), copy=False)
+    return np.moveaxis(resultado, -1, axis)
+
+def rolling_std_lote(returns: np.ndarray, window: int, days_size: int = 0,
+                     axis: int = -1, dtype=None) -> np.ndarray:
+    """
+    Desvio padrão móvel em O(n) ao longo de `axis`, com a mesma normalização de `rolling_std`.
+
+    Como em `sma_lote`, o cálculo é feito em float64 e só o resultado é
+    arredondado para float32 (erro relativo de até 2**-24, ~6e-8).
+    """
+    _, m2 = _momentos_moveis(returns, window, axis)
+    resultado = np.sqrt(m2 / (window - days_size)).astype(_dtype_float(returns, dtype), copy=False)
+    return np.moveaxis(resultado, -1, axis)
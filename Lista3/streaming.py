@@ -0,0 +1,155 @@
+"""
+streaming.py
+
+Acumuladores incrementais para séries recebidas tick a tick
+"""
+
+import math
+import numpy as np
+from typing import Any, Dict, NamedTuple
+
+class EstadoMovel(NamedTuple):
+    """
+    Resultado de um push: média móvel, desvio móvel e último retorno.
+    """
+    sma: float
+    std: float
+    retorno: float
+
+class EstadosMoveis(NamedTuple):
+    """
+    Resultado de um push_many: arrays com o estado após cada preço.
+    """
+    sma: np.ndarray
+    std: np.ndarray
+    retorno: np.ndarray
+
+class AcumuladorMovel:
+    """
+    Calcula SMA, desvio padrão móvel e retorno a cada novo preço, em O(1) por tick.
+
+    Os retornos (simples ou log, como em `calc_retornos_simples` e
+    `calc_retornos_log`) ficam em um buffer circular de tamanho `window`, e a
+    média e a soma dos quadrados dos desvios são atualizadas pelo método de
+    Welford para janelas deslizantes. A cada `window` ticks as somas são
+    recalculadas a partir do buffer, o que impede o acúmulo de erro de
+    arredondamento: os valores coincidem com `sma` e `rolling_std` até a
+    precisão de ponto flutuante. Enquanto a janela não estiver cheia, `sma`
+    e `std` valem NaN.
+    """
+
+    def __init__(self, window: int, days_size: int = 0, tipo_retorno: str = "simples"):
+        if window <= 0:
+            raise ValueError("window deve ser positivo.")
+        if tipo_retorno not in ("simples", "log"):
+            raise ValueError("tipo_retorno deve ser 'simples' ou 'log'.")
+        self.window = window
+        self.days_size = days_size
+        self.tipo_retorno = tipo_retorno
+        self._buffer = np.zeros(window)
+        self._pos = 0
+        self._count = 0
+        self._media = 0.0
+        self._m2 = 0.0
+        self._desde_resync = 0
+        self._ultimo_preco = math.nan
+
+    def _retorno(self, preco: float) -> float:
+        # escalares NumPy: preços nulos ou negativos dão inf/NaN, como nas funções em lote
+        anterior = np.float64(self._ultimo_preco)
+        if self.tipo_retorno == "log":
+            return float(np.log(preco / anterior))
+        return float((preco - anterior) / anterior)
+
+    def _resync(self) -> None:
+        self._media = float(np.mean(self._buffer))
+        self._m2 = float(np.sum((self._buffer - self._media) ** 2))
+        self._desde_resync = 0
+
+    def _adicionar(self, x: float) -> None:
+        w = self.window
+        if self._count < w:
+            self._buffer[self._pos] = x
+            self._count += 1
+            d = x - self._media
+            self._media += d / self._count
+            self._m2 += d * (x - self._media)
+        else:
+            y = self._buffer[self._pos]
+            self._buffer[self._pos] = x
+            media_antiga = self._media
+            self._media += (x - y) / w
+            self._m2 += (x - y) * (x - self._media + y - media_antiga)
+            self._desde_resync += 1
+            if self._desde_resync >= w:
+                self._resync()
+        # inf/NaN na janela contaminam as somas incrementais: recalcula do buffer
+        if self._count == w and not math.isfinite(self._m2):
+            self._resync()
+        self._pos = (self._pos + 1) % w
+
+    def estado(self, retorno: float = math.nan) -> EstadoMovel:
+        """
+        Valores correntes de SMA e desvio móvel, com o retorno informado.
+        """
+        if self._count < self.window:
+            return EstadoMovel(math.nan, math.nan, retorno)
+        std = math.sqrt(max(self._m2, 0.0) / (self.window - self.days_size))
+        return EstadoMovel(self._media, std, retorno)
+
+    def push(self, price: float) -> EstadoMovel:
+        """
+        Recebe um novo preço e devolve o estado atualizado.
+        """
+        price = float(price)
+        if math.isnan(self._ultimo_preco):
+            self._ultimo_preco = price
+            return self.estado()
+        retorno = self._retorno(price)
+        self._ultimo_preco = price
+        self._adicionar(retorno)
+        return self.estado(retorno)
+
+    def push_many(self, prices: np.ndarray) -> EstadosMoveis:
+        """
+        Recebe vários preços em sequência; devolve arrays com o estado após cada um.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        smas = np.empty(len(prices))
+        stds = np.empty(len(prices))
+        retornos = np.empty(len(prices))
+        for i, p in enumerate(prices):
+            smas[i], stds[i], retornos[i] = self.push(p)
+        return EstadosMoveis(smas, stds, retornos)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Exporta o estado completo como um dicionário de tipos nativos (serializável em JSON).
+        """
+        return {
+            "window": self.window,
+            "days_size": self.days_size,
+            "tipo_retorno": self.tipo_retorno,
+            "buffer": self._buffer.tolist(),
+            "pos": self._pos,
+            "count": self._count,
+            "media": self._media,
+            "m2": self._m2,
+            "desde_resync": self._desde_resync,
+            "ultimo_preco": self._ultimo_preco,
+        }
+
+    @classmethod
+    def from_snapshot(cls, estado: Dict[str, Any]) -> "AcumuladorMovel":
+        """
+        Reconstrói um acumulador a partir de `snapshot()`, retomando do mesmo ponto.
+        """
+        acc = cls(estado["window"], estado["days_size"], estado["tipo_retorno"])
+        acc._buffer = np.array(estado["buffer"], dtype=np.float64)
+        acc._pos = estado["pos"]
+        acc._count = estado["count"]
+        acc._media = estado["media"]
+        acc._m2 = estado["m2"]
+        acc._desde_resync = estado["desde_resync"]
+        acc._ultimo_preco = estado["ultimo_preco"]
+        return acc
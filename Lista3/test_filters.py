@@ -0,0 +1,34 @@
+"""
+test_filters.py
+
+Confere a detecção de picos vetorizada contra o laço de `local_peaks`.
+"""
+
+import numpy as np
+import pytest
+
+from filters import local_peaks, local_peaks_vetorizado
+
+def test_local_peaks_vetorizado_igual_ao_laco():
+    serie = np.random.default_rng(0).standard_normal(500).cumsum()
+    idx, picos = local_peaks_vetorizado(serie)
+    idx_ref, picos_ref = local_peaks(serie)
+    np.testing.assert_array_equal(idx, idx_ref)
+    np.testing.assert_array_equal(picos, picos_ref)
+
+@pytest.mark.parametrize("kwargs", [{}, {"prominence": 0.5}, {"distance": 3}, {"plateaus": True}])
+@pytest.mark.parametrize("axis", [0, 1, -1])
+def test_local_peaks_vetorizado_nd_alinha_indices_e_valores(axis, kwargs):
+    x = np.random.default_rng(1).standard_normal((4, 50)).cumsum(axis=1)
+    if axis == 0:
+        x = x.T
+    idx, picos = local_peaks_vetorizado(x, axis=axis, **kwargs)
+    np.testing.assert_array_equal(x[idx], picos)
+
+    # cada série, isolada, dá os mesmos picos que no lote
+    series = np.moveaxis(x, axis, -1)
+    esperado = set()
+    for i, serie in enumerate(series):
+        for t in local_peaks_vetorizado(serie, **kwargs)[0]:
+            esperado.add((t, i) if axis == 0 else (i, t))
+    assert set(zip(*(a.tolist() for a in idx))) == esperado
@@ -0,0 +1,86 @@
+"""
+test_precisao.py
+
+Confere que as rotinas com suporte a float32 preservam o tipo e ficam dentro
+dos limites de erro em relação ao float64 descritos nas suas docstrings.
+"""
+
+import numpy as np
+import pytest
+
+from operations import block_matmul, block_matmul_paralelo
+from simulations import (calc_retornos_log, calc_retornos_memmap, calc_retornos_simples,
+                         rolling_std_lote, simular_precos_lote, sma_lote)
+
+EPS32 = 2.0 ** -24
+
+def test_simular_precos_lote_float32():
+    S0, sigma, days, n_paths = 100.0, 2.0, 252, 500
+    precos = simular_precos_lote(S0, sigma, days, n_paths, rng=np.random.default_rng(0),
+                                 dtype=np.float32)
+    assert precos.dtype == np.float32
+    assert precos.shape == (n_paths, days + 1)
+
+    # mesmos ruídos float32, acumulados em float64
+    ruido = np.random.default_rng(0).standard_normal((n_paths, days), dtype=np.float32)
+    referencia = np.empty((n_paths, days + 1))
+    referencia[:, 0] = S0
+    referencia[:, 1:] = S0 + np.cumsum(ruido.astype(np.float64) * sigma, axis=1)
+
+    limite = days * 6e-8 * np.abs(referencia).max()
+    assert np.abs(precos - referencia).max() <= limite
+
+@pytest.mark.parametrize("window", [5, 50, 1000])
+def test_sma_e_rolling_std_lote_float32(window):
+    x = (np.random.default_rng(1).standard_normal((3, 20_000)) * 0.02).astype(np.float32)
+    x64 = x.astype(np.float64)
+
+    medias = sma_lote(x, window)
+    assert medias.dtype == np.float32
+    np.testing.assert_allclose(medias, sma_lote(x64, window), rtol=EPS32, atol=0)
+
+    desvios = rolling_std_lote(x, window, days_size=1)
+    assert desvios.dtype == np.float32
+    np.testing.assert_allclose(desvios, rolling_std_lote(x64, window, days_size=1),
+                               rtol=EPS32, atol=0)
+
+def test_sma_lote_dtype_explicito():
+    x = np.random.default_rng(2).standard_normal(1000)
+    assert sma_lote(x, 10, dtype=np.float32).dtype == np.float32
+    assert rolling_std_lote(x, 10, dtype=np.float32).dtype == np.float32
+
+@pytest.mark.parametrize("paralelo", [False, True])
+def test_block_matmul_float32(paralelo):
+    rng = np.random.default_rng(3)
+    A = rng.standard_normal((300, 500))
+    B = rng.standard_normal((500, 200))
+    if paralelo:
+        C = block_matmul_paralelo(A, B, block_size=64, num_threads=4, dtype=np.float32)
+    else:
+        C = block_matmul(A, B, 64, dtype=np.float32)
+    assert C.dtype == np.float32
+
+    A32 = A.astype(np.float32).astype(np.float64)
+    B32 = B.astype(np.float32).astype(np.float64)
+    referencia = A32 @ B32
+    p = A.shape[1]
+    assert np.all(np.abs(C - referencia) <= p * 6e-8 * (np.abs(A32) @ np.abs(B32)))
+
+@pytest.mark.parametrize("tipo", ["simples", "log"])
+def test_calc_retornos_memmap_float32(tmp_path, tipo):
+    precos = (100 + 0.1 * np.random.default_rng(4).standard_normal(50_000).cumsum()).astype(np.float32)
+    arquivo = tmp_path / "precos.bin"
+    precos.tofile(arquivo)
+
+    retornos = calc_retornos_memmap(str(arquivo), str(tmp_path / "retornos.bin"), tipo=tipo,
+                                    chunk_size=1000, dtype=np.float32)
+    assert retornos.dtype == np.float32
+    assert retornos.shape == (len(precos) - 1,)
+
+    p64 = precos.astype(np.float64)
+    if tipo == "simples":
+        referencia = calc_retornos_simples(p64)
+        assert np.all(np.abs(retornos - referencia) <= 2 * EPS32 * np.abs(referencia))
+    else:
+        referencia = calc_retornos_log(p64)
+        assert np.abs(retornos - referencia).max() <= 2 * EPS32
@@ -1,75 +1,361 @@
-from typing import Dict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple, Union
 import numpy as np
-import threading
+import os
+import time
 
+from profiling import criar_lock, instrumentar_tarefa
 
-def calcular_medias_moveis(acoes: Dict[str, np.ndarray], janela: int) -> Dict[str, np.ndarray]:
+
+# Janelas por segmento em _momentos_janelas
+_SEGMENTO = 1 << 14
+
+class ExecutorSerial(Executor):
+    """
+    Executor que roda cada tarefa imediatamente, na thread que chamou submit.
+
+    Serve de referência para comparar com os backends paralelos e para depuração.
+    """
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        futuro: Future = Future()
+        try:
+            futuro.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            futuro.set_exception(e)
+        return futuro
+
+
+# Pools reutilizados entre chamadas, um por (backend, número de workers)
+_executores: Dict[Tuple[str, int], Executor] = {}
+_executores_lock = criar_lock("advanced_concurrency.executores")
+
+
+def _obter_executor(executor: Union[str, Executor], num_workers: int) -> Executor:
+    """
+    Resolve o backend de execução: "thread", "process", "serial" ou um Executor já criado.
+
+    Os pools criados aqui ficam em cache e são reutilizados nas chamadas
+    seguintes, de modo que invocações repetidas não pagam o custo de criar
+    threads ou processos.
+    """
+    if isinstance(executor, Executor):
+        return executor
+    fabricas = {
+        "thread": lambda: ThreadPoolExecutor(max_workers=num_workers),
+        "process": lambda: ProcessPoolExecutor(max_workers=num_workers),
+        "serial": ExecutorSerial,
+    }
+    if executor not in fabricas:
+        raise ValueError("executor deve ser 'thread', 'process', 'serial' ou um Executor.")
+    chave = (executor, num_workers if executor != "serial" else 1)
+    with _executores_lock:
+        if chave not in _executores:
+            _executores[chave] = fabricas[executor]()
+        return _executores[chave]
+
+
+def _criar_compartilhado(n: int) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """
+    Cria um bloco de memória compartilhada com espaço para `n` floats e a view correspondente.
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(n * 8, 1))
+    return shm, np.ndarray((n,), dtype=np.float64, buffer=shm.buf)
+
+
+def _anexar_compartilhado(nome: str, n: int) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    """
+    Anexa (no processo trabalhador) um bloco criado por _criar_compartilhado.
+    """
+    shm = shared_memory.SharedMemory(name=nome)
+    return shm, np.ndarray((n,), dtype=np.float64, buffer=shm.buf)
+
+
+def _momentos_janelas(dados: np.ndarray, janela: int,
+                      com_m2: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Calcula a média e a soma dos quadrados dos desvios de cada janela ao longo do último eixo.
+
+    Mesmo esquema de `_momentos_moveis` (Lista 3, simulations.py), sem conversão
+    de tipo nem troca de eixo: os buffers de cada segmento são reaproveitados
+    in-place, e com `com_m2=False` a segunda soma acumulada nem é feita.
+
+    Args:
+        dados (np.ndarray): Array 1-D ou 2-D (uma série por linha).
+        janela (int): Tamanho da janela.
+        com_m2 (bool): Se False, calcula só as médias e devolve None no lugar de m2.
+
+    Returns:
+        Tuple[np.ndarray, Optional[np.ndarray]]: Médias e somas dos quadrados dos desvios por janela.
+    """
+    n_saida = max(dados.shape[-1] - janela + 1, 0)
+    medias = np.empty(dados.shape[:-1] + (n_saida,))
+    m2 = np.empty(dados.shape[:-1] + (n_saida,)) if com_m2 else None
+    for ini in range(0, n_saida, _SEGMENTO):
+        fim = min(ini + _SEGMENTO, n_saida)
+        segmento = dados[..., ini:fim + janela - 1]
+        ref = segmento.mean(axis=-1, keepdims=True)
+        centrados = segmento - ref
+        acum = np.zeros(centrados.shape[:-1] + (centrados.shape[-1] + 1,))
+        np.cumsum(centrados, axis=-1, out=acum[..., 1:])
+        s1 = np.subtract(acum[..., janela:], acum[..., :-janela], out=medias[..., ini:fim])
+        if com_m2:
+            np.multiply(centrados, centrados, out=centrados)
+            np.cumsum(centrados, axis=-1, out=acum[..., 1:])
+            s2 = acum[..., janela:] - acum[..., :-janela]
+            m2[..., ini:fim] = s2 - s1 * s1 / janela
+        s1 /= janela
+        s1 += ref
+    if com_m2:
+        np.maximum(m2, 0, out=m2)
+    return medias, m2
+
+
+def _agrupar_por_tamanho(acoes: Dict[str, np.ndarray], janela: int) -> Dict[int, List[str]]:
+    """
+    Agrupa as ações em baldes de tamanho: a menor potência de 2 maior ou igual ao tamanho da série.
+
+    Séries do mesmo tamanho sempre caem no mesmo balde; séries de tamanhos
+    diferentes são completadas até o tamanho do balde, o que no máximo dobra
+    o trabalho e permite calcular o balde inteiro em uma só operação.
+    """
+    baldes: Dict[int, List[str]] = {}
+    for acao, precos in acoes.items():
+        n = len(precos)
+        chave = n if n < janela else 1 << max(n - 1, 0).bit_length()
+        baldes.setdefault(chave, []).append(acao)
+    return baldes
+
+
+def _medias_balde(series: List[np.ndarray], tamanho: int, janela: int) -> List[np.ndarray]:
+    """
+    Calcula as médias móveis de um balde, empilhando as séries em um array 2-D.
+    """
+    if tamanho < janela:
+        # mantém o comportamento de np.convolve para séries menores que a janela
+        return [np.convolve(precos, np.ones(janela)/janela, mode='valid') for precos in series]
+    if all(len(precos) == tamanho for precos in series):
+        matriz = np.stack(series)
+    else:
+        matriz = np.empty((len(series), tamanho))
+        for linha, precos in enumerate(series):
+            matriz[linha, :len(precos)] = precos
+            matriz[linha, len(precos):] = precos[-1]
+    medias, _ = _momentos_janelas(matriz, janela, com_m2=False)
+    return [medias[linha, :len(precos) - janela + 1] for linha, precos in enumerate(series)]
+
+
+def _medias_balde_compartilhado(nome_entrada: str, n_entrada: int, nome_saida: str, n_saida: int,
+                                itens: List[Tuple[int, int, int]], tamanho: int, janela: int) -> None:
+    """
+    Versão de _medias_balde para processos: lê as séries e escreve as médias na memória compartilhada.
+
+    Cada item é (posição na entrada, tamanho da série, posição na saída).
+    """
+    shm_in, entrada = _anexar_compartilhado(nome_entrada, n_entrada)
+    shm_out, saida = _anexar_compartilhado(nome_saida, n_saida)
+    try:
+        series = [entrada[ini:ini + n] for ini, n, _ in itens]
+        for (_, _, ini_saida), medias in zip(itens, _medias_balde(series, tamanho, janela)):
+            saida[ini_saida:ini_saida + len(medias)] = medias
+        del series, entrada, saida
+    finally:
+        shm_in.close()
+        shm_out.close()
+
+
+def calcular_medias_moveis(acoes: Dict[str, np.ndarray], janela: int,
+                           num_workers: Optional[int] = None,
+                           executor: Union[str, Executor] = "thread") -> Dict[str, np.ndarray]:
     """
     Calcula as médias móveis para várias ações em paralelo.
 
-    Cada ação é processada por uma thread que calcula a média móvel com a janela especificada.
+    As ações são agrupadas em baldes de tamanho de série e cada balde é empilhado
+    em um array 2-D, de modo que todas as médias do balde saem de uma única operação
+    vetorizada; com séries do mesmo tamanho há um único balde. Os baldes (divididos
+    em até `num_workers` partes) rodam em um pool limitado e reutilizado entre
+    chamadas, em vez de uma thread por ação.
+
+    Com executor="process", os preços são copiados uma vez para memória
+    compartilhada e os processos escrevem as médias em outro bloco
+    compartilhado, sem serializar arrays. No Windows, chamadas com processos
+    devem partir de código protegido por `if __name__ == "__main__":`.
 
     Args:
         acoes (Dict[str, np.ndarray]): Dicionário onde as chaves são nomes das ações e os valores são arrays de preços.
         janela (int): Tamanho da janela para o cálculo da média móvel.
+        num_workers (Optional[int]): Número de workers do pool; por padrão, o número de CPUs.
+        executor (Union[str, Executor]): "thread", "process", "serial" ou um Executor próprio.
 
     Returns:
-        Dict[str, np.ndarray]: Dicionário com as médias móveis de cada ação.
+        Dict[str, np.ndarray]: Dicionário com as médias móveis de cada ação, na ordem de entrada.
     """
-    resultado: Dict[str, np.ndarray] = {}
-    lock = threading.Lock()
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    pool = _obter_executor(executor, num_workers)
+    acoes = {acao: np.asarray(precos, dtype=np.float64) for acao, precos in acoes.items()}
 
-    def calcular(acao: str, precos: np.ndarray) -> None:
-        medias = np.convolve(precos, np.ones(janela)/janela, mode='valid')
-        with lock:
-            resultado[acao] = medias
+    tarefas: List[Tuple[int, List[str]]] = []
+    for tamanho, nomes in _agrupar_por_tamanho(acoes, janela).items():
+        partes = min(num_workers, len(nomes))
+        for parte in np.array_split(np.arange(len(nomes)), partes):
+            tarefas.append((tamanho, [nomes[i] for i in parte]))
 
-    threads = [threading.Thread(target=calcular, args=(acao, precos))
-               for acao, precos in acoes.items()]
+    if not isinstance(pool, ProcessPoolExecutor):
+        futuros = [(nomes, pool.submit(instrumentar_tarefa(_medias_balde), [acoes[a] for a in nomes], tamanho, janela))
+                   for tamanho, nomes in tarefas]
+        parciais: Dict[str, np.ndarray] = {}
+        for nomes, f in futuros:
+            parciais.update(zip(nomes, f.result()))
+        return {acao: parciais[acao] for acao in acoes}
 
-    for t in threads:
-        t.start()
-    for t in threads:
-        t.join()
+    pos_entrada: Dict[str, int] = {}
+    pos_saida: Dict[str, Tuple[int, int]] = {}
+    n_entrada = n_saida = 0
+    for acao, precos in acoes.items():
+        # tamanho da saída de np.convolve(..., mode='valid')
+        tam_saida = abs(len(precos) - janela) + 1
+        pos_entrada[acao] = n_entrada
+        pos_saida[acao] = (n_saida, tam_saida)
+        n_entrada += len(precos)
+        n_saida += tam_saida
 
+    shm_in, entrada = _criar_compartilhado(n_entrada)
+    shm_out, saida = _criar_compartilhado(n_saida)
+    try:
+        for acao, precos in acoes.items():
+            entrada[pos_entrada[acao]:pos_entrada[acao] + len(precos)] = precos
+        futuros = [
+            pool.submit(_medias_balde_compartilhado, shm_in.name, n_entrada, shm_out.name, n_saida,
+                        [(pos_entrada[a], len(acoes[a]), pos_saida[a][0]) for a in nomes], tamanho, janela)
+            for tamanho, nomes in tarefas
+        ]
+        for f in futuros:
+            f.result()
+        resultado = {acao: saida[ini:ini + n].copy() for acao, (ini, n) in pos_saida.items()}
+        del entrada, saida
+    finally:
+        shm_in.close()
+        shm_in.unlink()
+        shm_out.close()
+        shm_out.unlink()
     return resultado
 
 
-def calcular_volatilidade(retornos: np.ndarray, janela: int, num_threads: int) -> np.ndarray:
+def _volatilidade_bloco(retornos: np.ndarray, inicio: int, fim: int, janela: int,
+                        saida: np.ndarray) -> None:
+    """
+    Escreve em saida[inicio:fim] o desvio padrão (populacional, como np.std) das janelas
+    que começam nesses índices, de forma vetorizada.
+    """
+    if fim <= inicio:
+        return
+    _, m2 = _momentos_janelas(retornos[inicio:fim + janela - 1], janela)
+    np.sqrt(m2 / janela, out=saida[inicio:fim])
+
+
+def _volatilidade_compartilhado(nome_entrada: str, n: int, nome_saida: str, n_saida: int,
+                                inicio: int, fim: int, janela: int) -> None:
+    """
+    Versão de _volatilidade_bloco para processos, sobre memória compartilhada.
+    """
+    shm_in, retornos = _anexar_compartilhado(nome_entrada, n)
+    shm_out, saida = _anexar_compartilhado(nome_saida, n_saida)
+    try:
+        _volatilidade_bloco(retornos, inicio, fim, janela, saida)
+        del retornos, saida
+    finally:
+        shm_in.close()
+        shm_out.close()
+
+
+def calcular_volatilidade(retornos: np.ndarray, janela: int, num_threads: int,
+                          executor: Union[str, Executor] = "thread") -> np.ndarray:
     """
     Calcula a volatilidade (desvio padrão) em janelas móveis sobre um array de retornos, utilizando múltiplas threads.
 
-    O array é particionado entre as threads, respeitando a sobreposição das janelas.
+    O array é particionado entre os workers, respeitando a sobreposição das janelas.
+    Cada worker calcula seu bloco inteiro de uma vez e escreve em uma fatia disjunta
+    de um array pré-alocado, então não há Lock: as operações do NumPy liberam a GIL
+    e as threads rodam de fato em paralelo. Com executor="process", entrada e saída
+    ficam em memória compartilhada e só os índices dos blocos são enviados aos processos.
 
     Args:
         retornos (np.ndarray): Array de retornos diários.
         janela (int): Tamanho da janela para o cálculo da volatilidade.
-        num_threads (int): Número de threads a serem usadas.
+        num_threads (int): Número de workers (threads ou processos) a serem usados.
+        executor (Union[str, Executor]): "thread", "process", "serial" ou um Executor próprio.
 
     Returns:
         np.ndarray: Array com as volatilidades calculadas para cada janela.
     """
+    retornos = np.asarray(retornos, dtype=np.float64)
     n = len(retornos)
-    resultado = [None] * (n - janela + 1)
-    lock = threading.Lock()
-
-    def worker(inicio: int, fim: int) -> None:
-        for i in range(inicio, min(fim, n - janela + 1)):
-            janela_dados = retornos[i:i+janela]
-            vol = np.std(janela_dados)
-            with lock:
-                resultado[i] = vol
+    n_saida = max(n - janela + 1, 0)
+    pool = _obter_executor(executor, num_threads)
 
     # Divide os índices de forma balanceada
-    blocos = np.linspace(0, n - janela + 1, num_threads + 1, dtype=int)
-    threads = [
-        threading.Thread(target=worker, args=(blocos[i], blocos[i+1]))
-        for i in range(num_threads)
-    ]
-
-    for t in threads:
-        t.start()
-    for t in threads:
-        t.join()
-
-    return np.array(resultado, dtype=np.float64)
+    blocos = np.linspace(0, n_saida, num_threads + 1, dtype=int)
+
+    if not isinstance(pool, ProcessPoolExecutor):
+        resultado = np.empty(n_saida, dtype=np.float64)
+        futuros = [pool.submit(instrumentar_tarefa(_volatilidade_bloco), retornos, blocos[i], blocos[i+1], janela, resultado)
+                   for i in range(num_threads)]
+        for f in futuros:
+            f.result()
+        return resultado
+
+    shm_in, entrada = _criar_compartilhado(n)
+    shm_out, saida = _criar_compartilhado(n_saida)
+    try:
+        entrada[:] = retornos
+        futuros = [pool.submit(_volatilidade_compartilhado, shm_in.name, n, shm_out.name, n_saida,
+                               int(blocos[i]), int(blocos[i+1]), janela)
+                   for i in range(num_threads)]
+        for f in futuros:
+            f.result()
+        resultado = saida.copy()
+        del entrada, saida
+    finally:
+        shm_in.close()
+        shm_in.unlink()
+        shm_out.close()
+        shm_out.unlink()
+    return resultado
+
+
+def benchmark_volatilidade(n: int = 5_000_000, janela: int = 252,
+                           threads: Tuple[int, ...] = (1, 2, 4, 8), repeticoes: int = 3,
+                           executor: Union[str, Executor] = "thread") -> Dict[int, float]:
+    """
+    Mede o tempo de calcular_volatilidade para cada número de threads.
+
+    Args:
+        n (int): Tamanho da série de retornos sintética.
+        janela (int): Tamanho da janela.
+        threads (Tuple[int, ...]): Números de threads a comparar.
+        repeticoes (int): Repetições por configuração; guarda-se o menor tempo.
+        executor (Union[str, Executor]): Backend a medir ("thread", "process" ou "serial").
+
+    Returns:
+        Dict[int, float]: Melhor tempo (em segundos) para cada número de threads.
+    """
+    retornos = np.random.default_rng(0).normal(0, 0.01, n)
+    tempos: Dict[int, float] = {}
+    for num_threads in threads:
+        melhor = float("inf")
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            calcular_volatilidade(retornos, janela, num_threads, executor)
+            melhor = min(melhor, time.perf_counter() - inicio)
+        tempos[num_threads] = melhor
+    return tempos
+
+
+if __name__ == "__main__":
+    for backend in ("thread", "process"):
+        tempos = benchmark_volatilidade(executor=backend)
+        base = tempos[min(tempos)]
+        for num_threads, tempo in tempos.items():
+            print(f"{backend} x{num_threads}: {tempo:.3f}s (speedup {base / tempo:.2f}x)")
@@ -0,0 +1,214 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import heapq
+import itertools
+import threading
+import time
+
+from profiling import criar_thread
+
+
+class RelogioReal:
+    """
+    Relógio de parede: delega para `time` e `threading`.
+
+    Define a interface comum aos relógios usados pelas simulações da Lista 4:
+    `agora`, `dormir`, `Condition` e `Thread`.
+    """
+
+    def agora(self) -> float:
+        return time.monotonic()
+
+    def dormir(self, segundos: float) -> None:
+        time.sleep(segundos)
+
+    def Condition(self, lock: Optional[threading.Lock] = None) -> threading.Condition:
+        return threading.Condition(lock)
+
+    def Thread(self, target: Callable[..., Any], args: Tuple[Any, ...] = ()) -> threading.Thread:
+        return criar_thread(target, args)
+
+
+class _Participante:
+    """
+    Thread controlada pelo relógio virtual.
+    """
+    __slots__ = ("evento", "geracao")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        # entradas da agenda com geração antiga são ignoradas (espera já encerrada)
+        self.geracao = 0
+
+
+class _CondicaoVirtual:
+    """
+    Condition cujas esperas com timeout correm no tempo virtual.
+    """
+
+    def __init__(self, relogio: "RelogioVirtual", lock: Optional[threading.Lock] = None):
+        self._relogio = relogio
+        self._lock = lock if lock is not None else threading.Lock()
+        self._esperando: List[_Participante] = []
+
+    def __enter__(self) -> bool:
+        return self._lock.acquire()
+
+    def __exit__(self, *args: Any) -> None:
+        self._lock.release()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        relogio = self._relogio
+        eu = relogio._eu()
+        self._esperando.append(eu)
+        if timeout is not None:
+            relogio._agendar(eu, relogio._agora + max(timeout, 0.0))
+        self._lock.release()
+        try:
+            relogio._ceder(eu)
+        finally:
+            self._lock.acquire()
+        if eu in self._esperando:
+            self._esperando.remove(eu)
+            return False
+        return True
+
+    def notify(self, n: int = 1) -> None:
+        for _ in range(min(n, len(self._esperando))):
+            self._relogio._agendar(self._esperando.pop(0), self._relogio._agora)
+
+    def notify_all(self) -> None:
+        self.notify(len(self._esperando))
+
+
+class _ThreadVirtual:
+    """
+    Thread que só executa quando o relógio virtual lhe passa a vez.
+    """
+
+    def __init__(self, relogio: "RelogioVirtual", target: Callable[..., Any], args: Tuple[Any, ...]):
+        self._relogio = relogio
+        self._target = target
+        self._args = args
+        self._participante = _Participante()
+        self._thread = threading.Thread(target=self._executar)
+        self._terminou = False
+        self._aguardando: List[_Participante] = []
+
+    def start(self) -> None:
+        relogio = self._relogio
+        relogio._eu()
+        relogio._agendar(self._participante, relogio._agora)
+        self._thread.start()
+
+    def _executar(self) -> None:
+        relogio = self._relogio
+        eu = self._participante
+        relogio._participantes[threading.get_ident()] = eu
+        relogio._esperar_vez(eu)
+        try:
+            self._target(*self._args)
+        finally:
+            self._terminou = True
+            for outro in self._aguardando:
+                relogio._agendar(outro, relogio._agora)
+            del relogio._participantes[threading.get_ident()]
+            relogio._passar_vez()
+
+    def join(self) -> None:
+        if self._terminou:
+            self._thread.join()
+            return
+        eu = self._relogio._eu()
+        self._aguardando.append(eu)
+        self._relogio._ceder(eu)
+        self._thread.join()
+
+    def is_alive(self) -> bool:
+        return not self._terminou
+
+
+class RelogioVirtual:
+    """
+    Escalonador de eventos discretos em tempo virtual.
+
+    As threads criadas por `Thread` executam uma de cada vez: quem está com a
+    vez roda até dormir, esperar uma `Condition` ou terminar, e então a vez
+    passa ao próximo evento da agenda (menor instante, desempate por ordem de
+    agendamento). O tempo salta direto para esse instante, sem espera real, de
+    modo que horas simuladas levam o tempo de CPU do código e, com o gerador
+    `random` semeado, o resultado é determinístico.
+
+    A thread que cria o relógio é a primeira a ter a vez; ela deve ser a que
+    dispara as threads e faz `join`. Um participante não deve segurar locks
+    comuns ao dormir. Se todos os participantes ficarem bloqueados sem evento
+    futuro, `RuntimeError` é levantado em vez de travar.
+
+    Args:
+        inicio (float): Instante virtual inicial, em segundos.
+    """
+
+    def __init__(self, inicio: float = 0.0):
+        self._agora = inicio
+        self._agenda: List[Tuple[float, int, int, _Participante]] = []
+        self._seq = itertools.count()
+        self._estado = threading.Lock()
+        self._participantes: Dict[int, _Participante] = {threading.get_ident(): _Participante()}
+        self._erro: Optional[str] = None
+
+    def agora(self) -> float:
+        return self._agora
+
+    def dormir(self, segundos: float) -> None:
+        eu = self._eu()
+        self._agendar(eu, self._agora + max(segundos, 0.0))
+        self._ceder(eu)
+
+    def Condition(self, lock: Optional[threading.Lock] = None) -> _CondicaoVirtual:
+        return _CondicaoVirtual(self, lock)
+
+    def Thread(self, target: Callable[..., Any], args: Tuple[Any, ...] = ()) -> _ThreadVirtual:
+        return _ThreadVirtual(self, target, args)
+
+    def _eu(self) -> _Participante:
+        eu = self._participantes.get(threading.get_ident())
+        if eu is None:
+            raise RuntimeError("Esta thread não participa do relógio virtual.")
+        return eu
+
+    def _agendar(self, participante: _Participante, instante: float) -> None:
+        with self._estado:
+            heapq.heappush(self._agenda, (instante, next(self._seq), participante.geracao, participante))
+
+    def _proximo(self) -> Optional[_Participante]:
+        with self._estado:
+            while self._agenda:
+                instante, _, geracao, participante = heapq.heappop(self._agenda)
+                if geracao != participante.geracao:
+                    continue
+                participante.geracao += 1
+                self._agora = max(self._agora, instante)
+                return participante
+            return None
+
+    def _passar_vez(self) -> None:
+        proximo = self._proximo()
+        if proximo is not None:
+            proximo.evento.set()
+        elif self._participantes:
+            # ninguém pode acordar os que restaram: libera todos com erro
+            self._erro = "Deadlock: todos os participantes estão bloqueados sem eventos futuros."
+            for participante in list(self._participantes.values()):
+                participante.evento.set()
+
+    def _esperar_vez(self, eu: _Participante) -> None:
+        eu.evento.wait()
+        eu.evento.clear()
+        if self._erro is not None:
+            raise RuntimeError(self._erro)
+
+    def _ceder(self, eu: _Participante) -> None:
+        self._passar_vez()
+        self._esperar_vez(eu)
+
+
+Relogio = Union[RelogioReal, RelogioVirtual]
@@ -0,0 +1,218 @@
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import heapq
+import itertools
+import random
+import time
+
+
+class Ordem:
+    """
+    Ordem limitada no livro. Usa __slots__ para manter cada registro compacto.
+    """
+    __slots__ = ("id", "lado", "tick", "quantidade", "ativa")
+
+    def __init__(self, id: int, lado: str, tick: int, quantidade: int):
+        self.id = id
+        self.lado = lado
+        self.tick = tick
+        self.quantidade = quantidade
+        self.ativa = True
+
+
+class Execucao:
+    """
+    Negócio gerado pelo casamento de uma ordem de compra com uma de venda.
+    """
+    __slots__ = ("compra_id", "venda_id", "preco", "quantidade")
+
+    def __init__(self, compra_id: int, venda_id: int, preco: float, quantidade: int):
+        self.compra_id = compra_id
+        self.venda_id = venda_id
+        self.preco = preco
+        self.quantidade = quantidade
+
+    def __repr__(self) -> str:
+        return f"Execucao(compra={self.compra_id}, venda={self.venda_id}, preco={self.preco}, qtd={self.quantidade})"
+
+
+class LivroOfertas:
+    """
+    Livro de ofertas com prioridade preço-tempo e motor de casamento.
+
+    Os preços são convertidos para ticks inteiros. Cada nível de preço guarda uma
+    fila FIFO (deque) de ordens, e os níveis de cada lado são indexados por um heap
+    (máximo para compras, mínimo para vendas). Inserção e cancelamento custam
+    O(log n) no pior caso e o topo do livro é lido em O(1): níveis que ficam vazios
+    são retirados do heap assim que esvaziam. Cancelamentos marcam a ordem como
+    inativa; ela é descartada da fila quando chega à frente.
+
+    Args:
+        tick (float): Incremento mínimo de preço.
+    """
+
+    def __init__(self, tick: float = 0.01):
+        self.tick = tick
+        self._filas: Dict[str, Dict[int, Deque[Ordem]]] = {"buy": {}, "sell": {}}
+        self._volume: Dict[str, Dict[int, int]] = {"buy": {}, "sell": {}}
+        # heaps de ticks: compras armazenadas com sinal invertido
+        self._heaps: Dict[str, List[int]] = {"buy": [], "sell": []}
+        self._ordens: Dict[int, Ordem] = {}
+        self._ids = itertools.count()
+        self.execucoes: List[Execucao] = []
+
+    def _para_tick(self, preco: float) -> int:
+        return int(round(preco / self.tick))
+
+    def _para_preco(self, tick: int) -> float:
+        return round(tick * self.tick, 10)
+
+    def _melhor_tick(self, lado: str) -> Optional[int]:
+        heap = self._heaps[lado]
+        if not heap:
+            return None
+        return -heap[0] if lado == "buy" else heap[0]
+
+    def _limpar_topo(self, lado: str) -> None:
+        heap = self._heaps[lado]
+        volume = self._volume[lado]
+        while heap:
+            tick = -heap[0] if lado == "buy" else heap[0]
+            if volume.get(tick, 0) > 0:
+                return
+            heapq.heappop(heap)
+            volume.pop(tick, None)
+            self._filas[lado].pop(tick, None)
+
+    def _descansar(self, ordem: Ordem) -> None:
+        lado, tick = ordem.lado, ordem.tick
+        fila = self._filas[lado].get(tick)
+        if fila is None:
+            fila = self._filas[lado][tick] = deque()
+            self._volume[lado][tick] = 0
+            heapq.heappush(self._heaps[lado], -tick if lado == "buy" else tick)
+        fila.append(ordem)
+        self._volume[lado][tick] += ordem.quantidade
+        self._ordens[ordem.id] = ordem
+
+    def _casar(self, ordem: Ordem) -> List[Execucao]:
+        oposto = "sell" if ordem.lado == "buy" else "buy"
+        execucoes: List[Execucao] = []
+        while ordem.quantidade > 0:
+            melhor = self._melhor_tick(oposto)
+            if melhor is None:
+                break
+            if (ordem.lado == "buy" and melhor > ordem.tick) or (ordem.lado == "sell" and melhor < ordem.tick):
+                break
+            fila = self._filas[oposto][melhor]
+            while fila and ordem.quantidade > 0:
+                passiva = fila[0]
+                if not passiva.ativa:
+                    fila.popleft()
+                    continue
+                qtd = min(ordem.quantidade, passiva.quantidade)
+                ordem.quantidade -= qtd
+                passiva.quantidade -= qtd
+                self._volume[oposto][melhor] -= qtd
+                compra, venda = (ordem, passiva) if ordem.lado == "buy" else (passiva, ordem)
+                execucoes.append(Execucao(compra.id, venda.id, self._para_preco(melhor), qtd))
+                if passiva.quantidade == 0:
+                    passiva.ativa = False
+                    fila.popleft()
+                    del self._ordens[passiva.id]
+            self._limpar_topo(oposto)
+        self.execucoes.extend(execucoes)
+        return execucoes
+
+    def inserir(self, lado: str, preco: float, quantidade: int,
+                id: Optional[int] = None) -> Tuple[int, List[Execucao]]:
+        """
+        Insere uma ordem limitada, casando-a com o lado oposto enquanto os preços cruzarem.
+
+        Args:
+            lado (str): 'buy' ou 'sell'.
+            preco (float): Preço limite.
+            quantidade (int): Quantidade da ordem.
+            id (Optional[int]): Identificador; por padrão, gerado sequencialmente.
+
+        Returns:
+            Tuple[int, List[Execucao]]: Id da ordem e negócios gerados; o saldo não executado fica no livro.
+        """
+        if lado not in ("buy", "sell"):
+            raise ValueError("lado deve ser 'buy' ou 'sell'.")
+        if quantidade <= 0:
+            raise ValueError("quantidade deve ser positiva.")
+        ordem = Ordem(next(self._ids) if id is None else id, lado, self._para_tick(preco), quantidade)
+        execucoes = self._casar(ordem)
+        if ordem.quantidade > 0:
+            self._descansar(ordem)
+        return ordem.id, execucoes
+
+    def cancelar(self, id: int) -> bool:
+        """
+        Cancela uma ordem ainda no livro.
+
+        Returns:
+            bool: True se a ordem estava ativa e foi cancelada.
+        """
+        ordem = self._ordens.pop(id, None)
+        if ordem is None:
+            return False
+        ordem.ativa = False
+        self._volume[ordem.lado][ordem.tick] -= ordem.quantidade
+        self._limpar_topo(ordem.lado)
+        return True
+
+    def topo(self) -> Tuple[Optional[float], int, Optional[float], int]:
+        """
+        Melhor compra e melhor venda, com as quantidades agregadas nesses níveis, em O(1).
+
+        Returns:
+            Tuple[Optional[float], int, Optional[float], int]: (bid, qtd_bid, ask, qtd_ask).
+        """
+        bid = self._melhor_tick("buy")
+        ask = self._melhor_tick("sell")
+        return (
+            None if bid is None else self._para_preco(bid),
+            0 if bid is None else self._volume["buy"][bid],
+            None if ask is None else self._para_preco(ask),
+            0 if ask is None else self._volume["sell"][ask],
+        )
+
+    def __len__(self) -> int:
+        return len(self._ordens)
+
+
+def benchmark_livro(n_ordens: int = 200_000, prob_cancelamento: float = 0.2,
+                    seed: int = 0) -> float:
+    """
+    Mede a vazão do livro de ofertas com um fluxo aleatório de inserções e cancelamentos.
+
+    Args:
+        n_ordens (int): Número de operações.
+        prob_cancelamento (float): Probabilidade de cada operação ser um cancelamento.
+        seed (int): Semente do gerador aleatório.
+
+    Returns:
+        float: Operações por segundo.
+    """
+    rng = random.Random(seed)
+    ops = []
+    for _ in range(n_ordens):
+        if rng.random() < prob_cancelamento:
+            ops.append(("cancel", rng.randrange(n_ordens), 0.0, 0))
+        else:
+            ops.append((rng.choice(("buy", "sell")), 0, round(rng.gauss(100, 2), 2), rng.randint(1, 100)))
+
+    livro = LivroOfertas()
+    inicio = time.perf_counter()
+    for lado, alvo, preco, qtd in ops:
+        if lado == "cancel":
+            livro.cancelar(alvo)
+        else:
+            livro.inserir(lado, preco, qtd)
+    return n_ordens / (time.perf_counter() - inicio)
+
+
+if __name__ == "__main__":
+    print(f"Livro de ofertas: {benchmark_livro():,.0f} ordens/s")
@@ -0,0 +1,276 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import json
+import os
+import threading
+import time
+import weakref
+
+
+# Ativado por configuração: variável de ambiente LISTA4_PROFILING=1 ou configurar_profiling(True)
+_ativo = os.environ.get("LISTA4_PROFILING", "0").lower() in ("1", "true", "sim")
+
+# Histogramas em potências de 2 de microssegundos: o balde b conta durações < 2**b µs
+_N_BALDES = 40
+
+# Só agregados: a memória depende do número de nomes e de locks vivos, não do
+# tempo de execução. Locks coletados somam suas estatísticas em _locks_encerrados.
+_registro_lock = threading.Lock()
+_locks_vivos: Dict[int, Tuple[str, "_EstatisticasLock"]] = {}
+_locks_encerrados: Dict[str, Dict[str, Any]] = {}
+_threads: Dict[str, Dict[str, float]] = {}
+
+
+def configurar_profiling(ativo: bool) -> None:
+    """
+    Liga ou desliga a instrumentação dos locks e threads criados a partir de agora.
+
+    Objetos já criados não mudam: desligado, `criar_lock` e `criar_thread`
+    devolvem os tipos do módulo `threading` sem nenhuma camada extra.
+    """
+    global _ativo
+    _ativo = ativo
+
+
+def profiling_ativo() -> bool:
+    return _ativo
+
+
+def _balde(segundos: float) -> int:
+    return min(int(segundos * 1e6).bit_length(), _N_BALDES - 1)
+
+
+class _EstatisticasLock:
+    """
+    Contadores de um LockInstrumentado, separados dele para sobreviverem à coleta do lock.
+    """
+    __slots__ = ("aquisicoes", "contendidas", "falhas", "espera_total", "espera_max",
+                 "posse_total", "posse_max", "hist_espera", "hist_posse")
+
+    def __init__(self):
+        self.aquisicoes = 0
+        self.contendidas = 0
+        self.falhas = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.posse_total = 0.0
+        self.posse_max = 0.0
+        self.hist_espera = [0] * _N_BALDES
+        self.hist_posse = [0] * _N_BALDES
+
+
+def _novo_agregado_lock() -> Dict[str, Any]:
+    return {
+        "instancias": 0, "aquisicoes": 0, "contendidas": 0, "falhas": 0,
+        "espera_total": 0.0, "espera_max": 0.0, "posse_total": 0.0, "posse_max": 0.0,
+        "hist_espera": [0] * _N_BALDES, "hist_posse": [0] * _N_BALDES,
+    }
+
+
+def _somar_lock(r: Dict[str, Any], e: _EstatisticasLock) -> None:
+    r["instancias"] += 1
+    for campo in ("aquisicoes", "contendidas", "falhas", "espera_total", "posse_total"):
+        r[campo] += getattr(e, campo)
+    r["espera_max"] = max(r["espera_max"], e.espera_max)
+    r["posse_max"] = max(r["posse_max"], e.posse_max)
+    r["hist_espera"] = [a + b for a, b in zip(r["hist_espera"], e.hist_espera)]
+    r["hist_posse"] = [a + b for a, b in zip(r["hist_posse"], e.hist_posse)]
+
+
+def _encerrar_lock(chave: int) -> None:
+    # chamado por weakref.finalize quando o lock é coletado
+    with _registro_lock:
+        registro = _locks_vivos.pop(chave, None)
+        if registro is not None:
+            nome, estatisticas = registro
+            _somar_lock(_locks_encerrados.setdefault(nome, _novo_agregado_lock()), estatisticas)
+
+
+class LockInstrumentado:
+    """
+    Lock com contagem de aquisições e histogramas de espera e de posse.
+
+    As estatísticas são atualizadas por quem detém o lock (logo após adquirir
+    e logo antes de liberar), então não precisam de sincronização adicional;
+    a exceção são as falhas de aquisição, contadas sob `_registro_lock`.
+    A aquisição tenta primeiro sem bloquear; só quando falha a espera é
+    cronometrada e contada como contenção. Quando o lock é coletado, suas
+    estatísticas são somadas ao total do seu nome.
+
+    Args:
+        nome (str): Nome usado para agregar o lock no relatório.
+    """
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self._lock = threading.Lock()
+        self._dono: Optional[int] = None
+        self._inicio_posse = 0.0
+        self.estatisticas = _EstatisticasLock()
+        chave = id(self.estatisticas)
+        with _registro_lock:
+            _locks_vivos[chave] = (nome, self.estatisticas)
+        weakref.finalize(self, _encerrar_lock, chave)
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        espera = 0.0
+        if not self._lock.acquire(False):
+            if not blocking:
+                self._contar_falha()
+                return False
+            inicio = time.perf_counter()
+            if not self._lock.acquire(True, timeout):
+                self._contar_falha()
+                return False
+            espera = time.perf_counter() - inicio
+            self.estatisticas.contendidas += 1
+        self._dono = threading.get_ident()
+        e = self.estatisticas
+        e.aquisicoes += 1
+        e.espera_total += espera
+        if espera > e.espera_max:
+            e.espera_max = espera
+        e.hist_espera[_balde(espera)] += 1
+        self._inicio_posse = time.perf_counter()
+        return True
+
+    def _contar_falha(self) -> None:
+        # quem falha não detém o lock; outras threads podem estar falhando ao mesmo tempo
+        with _registro_lock:
+            self.estatisticas.falhas += 1
+
+    def release(self) -> None:
+        posse = time.perf_counter() - self._inicio_posse
+        e = self.estatisticas
+        e.posse_total += posse
+        if posse > e.posse_max:
+            e.posse_max = posse
+        e.hist_posse[_balde(posse)] += 1
+        self._dono = None
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def _is_owned(self) -> bool:
+        # usado por threading.Condition para validar wait/notify
+        return self._dono == threading.get_ident()
+
+    __enter__ = acquire
+
+    def __exit__(self, *args: Any) -> None:
+        self.release()
+
+
+class ThreadInstrumentada(threading.Thread):
+    """
+    Thread que soma seu tempo de CPU (`time.thread_time`) e de parede ao total de `nome_profiling` ao terminar.
+    """
+
+    nome_profiling = ""
+
+    def run(self) -> None:
+        cpu, parede = time.thread_time(), time.perf_counter()
+        try:
+            super().run()
+        finally:
+            _registrar_thread(self.nome_profiling or self.name,
+                              time.thread_time() - cpu, time.perf_counter() - parede)
+
+
+def _registrar_thread(nome: str, cpu: float, parede: float) -> None:
+    with _registro_lock:
+        r = _threads.setdefault(nome, {"execucoes": 0, "cpu": 0.0, "parede": 0.0})
+        r["execucoes"] += 1
+        r["cpu"] += cpu
+        r["parede"] += parede
+
+
+def _nome_funcao(fn: Callable[..., Any]) -> str:
+    return getattr(fn, "__qualname__", None) or repr(fn)
+
+
+def criar_lock(nome: str) -> Union[threading.Lock, LockInstrumentado]:
+    """
+    Cria um Lock; instrumentado se o profiling estiver ativo.
+    """
+    return LockInstrumentado(nome) if _ativo else threading.Lock()
+
+
+def criar_thread(target: Callable[..., Any], args: Tuple[Any, ...] = (),
+                 nome: Optional[str] = None) -> threading.Thread:
+    """
+    Cria uma Thread; com o profiling ativo, ela registra seu tempo de CPU sob `nome` ou o nome da função alvo.
+    """
+    if not _ativo:
+        return threading.Thread(target=target, args=args, name=nome)
+    thread = ThreadInstrumentada(target=target, args=args, name=nome)
+    # nomes automáticos ("Thread-N") são únicos: agrega pela função alvo
+    thread.nome_profiling = nome or _nome_funcao(target)
+    return thread
+
+
+def instrumentar_tarefa(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Embrulha uma tarefa de pool de threads para registrar o CPU gasto nela.
+
+    Com o profiling desligado devolve a própria função. As tarefas são somadas
+    sob o nome da função, não o da thread do pool, que muda a cada pool criado.
+    """
+    if not _ativo:
+        return fn
+    nome = _nome_funcao(fn)
+
+    def tarefa(*args: Any, **kwargs: Any) -> Any:
+        cpu, parede = time.thread_time(), time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _registrar_thread(nome, time.thread_time() - cpu, time.perf_counter() - parede)
+    return tarefa
+
+
+def _histograma(contagens: List[int]) -> Dict[str, int]:
+    return {f"<{1 << b}us": c for b, c in enumerate(contagens) if c}
+
+
+def relatorio() -> Dict[str, Any]:
+    """
+    Relatório estruturado da instrumentação desde o último `limpar_profiling`.
+
+    Locks com o mesmo nome (por exemplo, um por shard) são agregados.
+    Tempos em segundos; histogramas indexados pelo limite superior em µs.
+
+    Returns:
+        Dict[str, Any]: {"locks": {nome: estatísticas}, "threads": {nome: cpu/parede/execucoes}}.
+    """
+    with _registro_lock:
+        por_lock: Dict[str, Dict[str, Any]] = {}
+        for nome, r in _locks_encerrados.items():
+            por_lock[nome] = dict(r)
+        for nome, estatisticas in _locks_vivos.values():
+            _somar_lock(por_lock.setdefault(nome, _novo_agregado_lock()), estatisticas)
+        por_thread = {nome: dict(r) for nome, r in _threads.items()}
+    for r in por_lock.values():
+        r["taxa_contencao"] = r["contendidas"] / r["aquisicoes"] if r["aquisicoes"] else 0.0
+        r["hist_espera"] = _histograma(r["hist_espera"])
+        r["hist_posse"] = _histograma(r["hist_posse"])
+
+    return {"locks": por_lock, "threads": por_thread}
+
+
+def exportar_relatorio(caminho: str) -> None:
+    """
+    Salva o relatório em JSON.
+    """
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(relatorio(), f, indent=2, ensure_ascii=False)
+
+
+def limpar_profiling() -> None:
+    """
+    Descarta os registros acumulados; locks já criados deixam de aparecer no relatório.
+    """
+    with _registro_lock:
+        _locks_vivos.clear()
+        _locks_encerrados.clear()
+        _threads.clear()
@@ -1,41 +1,274 @@
-from typing import List, Tuple, Dict
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Deque, List, Tuple, Dict, Optional, Union
+import asyncio
+import heapq
+import itertools
+import math
 import threading
-import time
 import random
+import numpy as np
 
+from clock import Relogio, RelogioReal
+from profiling import criar_lock
 
-def gerenciar_risco(total_risco: float, estrategias: List[Tuple[str, float]], tempo_total: int) -> Dict[str, float]:
+
+# Histograma das esperas em escala log: 8 baldes por potência de 2 de microssegundos,
+# então o p99 sai com erro relativo de no máximo 2**(1/8) - 1 (~9%)
+_BALDES_POR_OITAVA = 8
+_N_BALDES_ESPERA = 40 * _BALDES_POR_OITAVA
+
+
+def _balde_espera(segundos: float) -> int:
+    us = segundos * 1e6
+    if us <= 1.0:
+        return 0
+    return min(int(math.log2(us) * _BALDES_POR_OITAVA) + 1, _N_BALDES_ESPERA - 1)
+
+
+def _limite_balde(balde: int) -> float:
+    # limite superior do balde, em segundos
+    return 2.0 ** (balde / _BALDES_POR_OITAVA) * 1e-6
+
+
+class _Pedido:
+    """
+    Pedido de risco aguardando na fila do AlocadorRisco.
     """
-    Simula a alocação concorrente de risco entre várias estratégias, com sincronização via Lock.
+    __slots__ = ("nome", "risco", "prioridade", "seq", "cond", "concedido", "cancelado")
+
+    def __init__(self, nome: str, risco: float, prioridade: float, seq: int, cond: threading.Condition):
+        self.nome = nome
+        self.risco = risco
+        self.prioridade = prioridade
+        self.seq = seq
+        self.cond = cond
+        self.concedido = False
+        self.cancelado = False
+
+    def __lt__(self, outro: "_Pedido") -> bool:
+        return (-self.prioridade, self.seq) < (-outro.prioridade, outro.seq)
+
+
+class AlocadorRisco:
+    """
+    Orçamento de risco compartilhado, com espera bloqueante via threading.Condition.
+
+    Cada pedido que não pode ser atendido espera em uma Condition própria
+    (todas sobre o mesmo Lock), e `release` acorda apenas os pedidos que
+    passam a caber no orçamento, sem polling e sem acordar todos os
+    waiters a cada liberação.
+
+    Políticas de justiça:
+        - "fifo": atende estritamente por ordem de chegada; um pedido grande
+          no início da fila bloqueia os seguintes (sem starvation).
+        - "prioridade": como "fifo", mas ordenando por prioridade (maior primeiro).
+        - "primeiro_que_cabe": percorre a fila em ordem de chegada e atende
+          todo pedido que cabe, mesmo que um anterior não caiba.
+
+    Args:
+        total_risco (float): Orçamento total de risco.
+        politica (str): "fifo", "prioridade" ou "primeiro_que_cabe".
+        relogio (Optional[Relogio]): Relógio usado para timeouts e esperas (real por padrão).
+    """
+
+    def __init__(self, total_risco: float, politica: str = "fifo", relogio: Optional[Relogio] = None):
+        if politica not in ("fifo", "prioridade", "primeiro_que_cabe"):
+            raise ValueError("politica deve ser 'fifo', 'prioridade' ou 'primeiro_que_cabe'.")
+        self.total_risco = total_risco
+        self.politica = politica
+        self._relogio = relogio if relogio is not None else RelogioReal()
+        self._disponivel = total_risco
+        self._lock = criar_lock("AlocadorRisco")
+        # heap para "prioridade", deque nas demais políticas
+        self._fila: Union[List[_Pedido], Deque[_Pedido]] = [] if politica == "prioridade" else deque()
+        self._seq = itertools.count()
+        self._alocado: Dict[str, float] = {}
+        # agregados de tamanho fixo: memória e custo de metricas() não crescem com as concessões
+        self._concessoes = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+        self._hist_espera = [0] * _N_BALDES_ESPERA
+        self._timeouts = 0
+
+    @property
+    def disponivel(self) -> float:
+        with self._lock:
+            return self._disponivel
+
+    def _conceder(self, pedido: _Pedido) -> None:
+        self._disponivel -= pedido.risco
+        self._alocado[pedido.nome] = self._alocado.get(pedido.nome, 0.0) + pedido.risco
+        pedido.concedido = True
+        pedido.cond.notify()
+
+    def _despachar(self) -> None:
+        # Chamado com o lock adquirido
+        if self.politica == "primeiro_que_cabe":
+            restantes: Deque[_Pedido] = deque()
+            for pedido in self._fila:
+                if pedido.cancelado:
+                    continue
+                if pedido.risco <= self._disponivel:
+                    self._conceder(pedido)
+                else:
+                    restantes.append(pedido)
+            self._fila = restantes
+            return
+        while self._fila:
+            pedido = self._fila[0]
+            if pedido.cancelado:
+                self._remover_topo()
+            elif pedido.risco <= self._disponivel:
+                self._remover_topo()
+                self._conceder(pedido)
+            else:
+                break
+
+    def _remover_topo(self) -> None:
+        if self.politica == "prioridade":
+            heapq.heappop(self._fila)
+        else:
+            self._fila.popleft()
+
+    def acquire(self, nome: str, risco: float, timeout: Optional[float] = None,
+                prioridade: float = 0.0) -> bool:
+        """
+        Reserva `risco` para a estratégia `nome`, esperando até haver orçamento.
+
+        Args:
+            nome (str): Nome da estratégia.
+            risco (float): Quantidade de risco desejada.
+            timeout (Optional[float]): Tempo máximo de espera em segundos; None espera indefinidamente.
+            prioridade (float): Usada apenas na política "prioridade" (maior é atendido antes).
+
+        Returns:
+            bool: True se o risco foi alocado, False se o tempo de espera esgotou.
+        """
+        if risco > self.total_risco:
+            raise ValueError("risco pedido maior que o orçamento total.")
+        inicio = self._relogio.agora()
+        with self._lock:
+            pedido = _Pedido(nome, risco, prioridade, next(self._seq), self._relogio.Condition(self._lock))
+            if self.politica == "prioridade":
+                heapq.heappush(self._fila, pedido)
+            else:
+                self._fila.append(pedido)
+            self._despachar()
+            prazo = None if timeout is None else inicio + timeout
+            while not pedido.concedido:
+                restante = None if prazo is None else prazo - self._relogio.agora()
+                if restante is not None and restante <= 0:
+                    pedido.cancelado = True
+                    self._timeouts += 1
+                    # a saída deste pedido pode liberar os que estavam atrás dele
+                    self._despachar()
+                    return False
+                pedido.cond.wait(restante)
+            espera = self._relogio.agora() - inicio
+            self._concessoes += 1
+            self._espera_total += espera
+            if espera > self._espera_max:
+                self._espera_max = espera
+            self._hist_espera[_balde_espera(espera)] += 1
+            return True
+
+    def release(self, nome: str, risco: Optional[float] = None) -> None:
+        """
+        Devolve ao orçamento o risco da estratégia `nome` (todo, ou apenas `risco`).
+
+        Args:
+            nome (str): Nome da estratégia.
+            risco (Optional[float]): Quanto devolver; None devolve tudo o que está alocado.
+        """
+        with self._lock:
+            alocado = self._alocado.get(nome, 0.0)
+            devolver = alocado if risco is None else risco
+            if devolver > alocado + 1e-12:
+                raise ValueError(f"{nome} não tem {devolver} de risco alocado.")
+            if alocado - devolver <= 1e-12:
+                self._alocado.pop(nome, None)
+            else:
+                self._alocado[nome] = alocado - devolver
+            self._disponivel += devolver
+            self._despachar()
+
+    def alocacoes(self) -> Dict[str, float]:
+        """
+        Retorna uma cópia do risco atualmente alocado por estratégia.
+        """
+        with self._lock:
+            return dict(self._alocado)
+
+    def metricas(self) -> Dict[str, float]:
+        """
+        Estatísticas de espera: concessões, timeouts, fila atual e tempos médio, p99 e máximo (s).
+
+        Média e máximo são exatos; o p99 vem de um histograma logarítmico de
+        tamanho fixo e é o limite superior do seu balde (erro de até ~9%, para cima).
+        """
+        with self._lock:
+            n = self._concessoes
+            total = self._espera_total
+            maximo = self._espera_max
+            hist = list(self._hist_espera)
+            fila = sum(1 for p in self._fila if not p.cancelado)
+            timeouts = self._timeouts
+        p99 = 0.0
+        if n:
+            # mesma posição do p99 na lista ordenada: o (int(0.99 * n) + 1)-ésimo valor
+            alvo = min(n - 1, int(0.99 * n)) + 1
+            acumulado = 0
+            for balde, contagem in enumerate(hist):
+                acumulado += contagem
+                if acumulado >= alvo:
+                    p99 = min(_limite_balde(balde), maximo)
+                    break
+        return {
+            "concessoes": n,
+            "timeouts": timeouts,
+            "em_espera": fila,
+            "espera_media": total / n if n else 0.0,
+            "espera_p99": p99,
+            "espera_max": maximo,
+        }
+
+
+def gerenciar_risco(total_risco: float, estrategias: List[Tuple[str, float]], tempo_total: int,
+                    relogio: Optional[Relogio] = None) -> Dict[str, float]:
+    """
+    Simula a alocação concorrente de risco entre várias estratégias, com sincronização via Condition.
 
     Cada estratégia roda em uma thread separada e tenta alocar parte do risco total disponível.
-    Se não houver risco suficiente, a thread espera. A alocação é protegida por um Lock.
+    Se não houver risco suficiente, a thread espera (sem polling) em um AlocadorRisco até
+    o fim da simulação. A política "primeiro_que_cabe" preserva o comportamento original:
+    qualquer estratégia cujo pedido caiba no risco restante é atendida.
 
     Args:
         total_risco (float): Valor total de risco disponível para alocação.
         estrategias (List[Tuple[str, float]]): Lista de tuplas (nome da estratégia, risco desejado).
         tempo_total (int): Duração da simulação em segundos.
+        relogio (Optional[Relogio]): Relógio da simulação; com um `RelogioVirtual` a espera
+            até o fim do prazo é instantânea e determinística.
 
     Returns:
         Dict[str, float]: Risco alocado para cada estratégia ao final da simulação.
     """
-    risco_restante = total_risco
+    if relogio is None:
+        relogio = RelogioReal()
+    alocador = AlocadorRisco(total_risco, politica="primeiro_que_cabe", relogio=relogio)
     risco_alocado: Dict[str, float] = {}
-    lock = threading.Lock()
-    start_time = time.time()
+    lock = criar_lock("gerenciar_risco")
+    prazo = relogio.agora() + tempo_total
 
     def alocar_estrategia(nome: str, risco_desejado: float) -> None:
-        nonlocal risco_restante
-        while time.time() - start_time < tempo_total:
+        if risco_desejado > total_risco:
+            return
+        if alocador.acquire(nome, risco_desejado, timeout=max(prazo - relogio.agora(), 0)):
             with lock:
-                if risco_restante >= risco_desejado:
-                    risco_restante -= risco_desejado
-                    risco_alocado[nome] = risco_desejado
-                    return
-            time.sleep(0.1)
+                risco_alocado[nome] = risco_desejado
 
     threads = [
-        threading.Thread(target=alocar_estrategia, args=(nome, risco))
+        relogio.Thread(target=alocar_estrategia, args=(nome, risco))
         for nome, risco in estrategias
     ]
 
@@ -47,7 +280,7 @@ def gerenciar_risco(total_risco: float, estrategias: List[Tuple[str, float]], te
     return risco_alocado
 
 
-def monitorar_acoes(acoes: List[str], valor_alvo: float) -> List[str]:
+def monitorar_acoes(acoes: List[str], valor_alvo: float, relogio: Optional[Relogio] = None) -> List[str]:
     """
     Simula o monitoramento concorrente de ações para detectar se o valor-alvo foi atingido.
 
@@ -57,17 +290,20 @@ def monitorar_acoes(acoes: List[str], valor_alvo: float) -> List[str]:
     Args:
         acoes (List[str]): Lista com os nomes das ações a monitorar.
         valor_alvo (float): Valor a ser monitorado entre o preço anterior e o atual.
+        relogio (Optional[Relogio]): Relógio usado nos atrasos (real por padrão).
 
     Returns:
         List[str]: Lista com os nomes das ações cujo preço atingiu ou ultrapassou o valor-alvo.
     """
+    if relogio is None:
+        relogio = RelogioReal()
     atingidas: List[str] = []
-    lock = threading.Lock()
+    lock = criar_lock("monitorar_acoes")
 
     def monitorar(acao: str) -> None:
-        time.sleep(random.uniform(0.1, 0.5))
+        relogio.dormir(random.uniform(0.1, 0.5))
         preco_anterior = random.uniform(80, 120)
-        time.sleep(random.uniform(0.1, 0.5))
+        relogio.dormir(random.uniform(0.1, 0.5))
         preco_atual = random.uniform(80, 120)
 
         minimo = min(preco_anterior, preco_atual)
@@ -77,7 +313,7 @@ def monitorar_acoes(acoes: List[str], valor_alvo: float) -> List[str]:
             with lock:
                 atingidas.append(acao)
 
-    threads = [threading.Thread(target=monitorar, args=(acao,)) for acao in acoes]
+    threads = [relogio.Thread(target=monitorar, args=(acao,)) for acao in acoes]
 
     for t in threads:
         t.start()
@@ -85,3 +321,87 @@ def monitorar_acoes(acoes: List[str], valor_alvo: float) -> List[str]:
         t.join()
 
     return atingidas
+
+
+# Fonte de preços assíncrona: produz lotes (índices das ações, preços)
+FontePrecos = AsyncIterable[Tuple[np.ndarray, np.ndarray]]
+
+
+class FontePrecosSimulada:
+    """
+    Fonte assíncrona de preços simulados, para testes e demonstrações.
+
+    Em cada rodada todas as ações recebem um preço uniforme em [80, 120], em ordem
+    aleatória e entregue em lotes de `tamanho_lote` atualizações. Entre lotes a
+    fonte cede o event loop (`asyncio.sleep(atraso)`), como faria uma fonte real.
+
+    Args:
+        n_acoes (int): Número de ações (índices 0..n_acoes-1).
+        rodadas (int): Quantas atualizações cada ação recebe.
+        tamanho_lote (int): Número de atualizações por lote.
+        atraso (float): Espera, em segundos, entre lotes.
+        seed (Optional[int]): Semente do gerador aleatório.
+    """
+
+    def __init__(self, n_acoes: int, rodadas: int = 2, tamanho_lote: int = 10_000,
+                 atraso: float = 0.0, seed: Optional[int] = None):
+        self.n_acoes = n_acoes
+        self.rodadas = rodadas
+        self.tamanho_lote = tamanho_lote
+        self.atraso = atraso
+        self.rng = np.random.default_rng(seed)
+
+    async def __aiter__(self) -> AsyncIterator[Tuple[np.ndarray, np.ndarray]]:
+        for _ in range(self.rodadas):
+            ordem = self.rng.permutation(self.n_acoes)
+            precos = self.rng.uniform(80, 120, self.n_acoes)
+            for inicio in range(0, self.n_acoes, self.tamanho_lote):
+                await asyncio.sleep(self.atraso)
+                yield ordem[inicio:inicio + self.tamanho_lote], precos[inicio:inicio + self.tamanho_lote]
+
+
+async def monitorar_acoes_async(acoes: List[str], valor_alvo: Union[float, np.ndarray],
+                                fonte: Optional[FontePrecos] = None) -> AsyncIterator[str]:
+    """
+    Monitora muitas ações em um único event loop, emitindo cada ação assim que o valor-alvo é cruzado.
+
+    Para cada lote da fonte, compara de forma vetorizada o preço anterior e o atual de
+    cada ação: se o valor-alvo estiver entre os dois, o nome da ação é emitido. Não há
+    uma thread ou tarefa por ação, então centenas de milhares de ações cabem em um só loop.
+    Um mesmo lote pode trazer várias atualizações da mesma ação; elas são avaliadas em ordem.
+
+    Args:
+        acoes (List[str]): Lista com os nomes das ações a monitorar.
+        valor_alvo (Union[float, np.ndarray]): Valor-alvo único ou um por ação.
+        fonte (Optional[FontePrecos]): Iterável assíncrono de lotes (índices em `acoes`, preços);
+            por padrão, FontePrecosSimulada com duas rodadas, como em monitorar_acoes.
+
+    Yields:
+        str: Nome de cada ação cujo preço atingiu o valor-alvo, na ordem de detecção.
+    """
+    if fonte is None:
+        fonte = FontePrecosSimulada(len(acoes))
+    alvos = np.broadcast_to(np.asarray(valor_alvo, dtype=np.float64), (len(acoes),))
+    ultimo = np.full(len(acoes), np.nan)
+
+    async for indices, precos in fonte:
+        indices = np.asarray(indices, dtype=np.intp)
+        precos = np.asarray(precos, dtype=np.float64)
+        # ordena por ação (estável) para encadear atualizações repetidas no mesmo lote
+        ordem = np.argsort(indices, kind="stable")
+        indices, precos = indices[ordem], precos[ordem]
+        repetida = np.zeros(len(indices), dtype=bool)
+        repetida[1:] = indices[1:] == indices[:-1]
+        anteriores = ultimo[indices]
+        anteriores[1:][repetida[1:]] = precos[:-1][repetida[1:]]
+
+        alvo = alvos[indices]
+        atingiu = (np.minimum(anteriores, precos) <= alvo) & (alvo <= np.maximum(anteriores, precos))
+        ultima_do_lote = np.ones(len(indices), dtype=bool)
+        ultima_do_lote[:-1] = ~repetida[1:]
+        ultimo[indices[ultima_do_lote]] = precos[ultima_do_lote]
+
+        # emite na ordem em que as atualizações chegaram no lote
+        emitir = indices[atingiu][np.argsort(ordem[atingiu], kind="stable")]
+        for i in emitir.tolist():
+            yield acoes[i]
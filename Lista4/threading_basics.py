@@ -1,24 +1,32 @@
-from typing import List, Dict, Any
-import threading
+from typing import List, Dict, Any, Optional, Tuple
 import random
 import time
 
-def simular_traders(num_traders: int, num_ordens: int) -> Dict[str, List[Dict[str, Any]]]:
+from order_book import LivroOfertas
+from price_bus import BarramentoPrecos
+from clock import Relogio, RelogioReal
+from profiling import criar_lock, criar_thread
+
+def simular_traders(num_traders: int, num_ordens: int,
+                    livro: Optional[LivroOfertas] = None) -> Dict[str, List[Dict[str, Any]]]:
     """
     Simula múltiplos traders inserindo ordens de compra e venda concorrentemente.
 
     Cada trader é representado por uma thread que insere ordens em um livro de ordens (order book)
     compartilhado. A sincronização é garantida por um threading.Lock para evitar condições de corrida.
+    Se `livro` for informado, cada ordem também é enviada ao LivroOfertas, que casa compras e
+    vendas por prioridade preço-tempo; os negócios ficam em `livro.execucoes`.
 
     Args:
         num_traders (int): Número de traders (threads).
         num_ordens (int): Número de ordens que cada trader irá colocar.
+        livro (Optional[LivroOfertas]): Livro de ofertas com motor de casamento (opcional).
 
     Returns:
         Dict[str, List[Dict[str, Any]]]: Estado final do livro de ordens, contendo listas de ordens de compra e venda.
     """
     order_book = {'buy': [], 'sell': []}
-    lock = threading.Lock()
+    lock = criar_lock("simular_traders")
     ordem_id = 0
 
     def trader() -> None:
@@ -33,57 +41,163 @@ def simular_traders(num_traders: int, num_ordens: int) -> Dict[str, List[Dict[st
                 ordem_id += 1
                 lado = random.choice(['buy', 'sell'])
                 order_book[lado].append(ordem)
+                if livro is not None:
+                    livro.inserir(lado, ordem['price'], ordem['quantity'], id=ordem['id'])
+
+    threads = [criar_thread(target=trader) for _ in range(num_traders)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return order_book
+
+
+def simular_traders_em_lotes(num_traders: int, num_ordens: int, tamanho_lote: int = 256,
+                             num_shards: int = 4, seed: Optional[int] = None,
+                             metricas: Optional[Dict[str, float]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Versão de baixa contenção de simular_traders, com o mesmo formato de retorno.
 
-    threads = [threading.Thread(target=trader) for _ in range(num_traders)]
+    Cada trader gera suas ordens fora de qualquer seção crítica, com um random.Random
+    próprio, e numera-as em uma faixa exclusiva: a i-ésima ordem do trader t recebe
+    o id t * num_ordens + i, sem contador compartilhado. As ordens são acumuladas
+    localmente e gravadas em lotes de `tamanho_lote` em um de `num_shards` shards,
+    cada um com seu Lock. Ao final os shards são mesclados por id, de modo que, com
+    `seed`, o resultado é o mesmo em toda execução, qualquer que seja o escalonamento.
+
+    Args:
+        num_traders (int): Número de traders (threads).
+        num_ordens (int): Número de ordens que cada trader irá colocar.
+        tamanho_lote (int): Quantas ordens cada trader acumula antes de gravar no shard.
+        num_shards (int): Número de shards (filas com lock próprio).
+        seed (Optional[int]): Semente; o trader i usa random.Random(seed + i).
+        metricas (Optional[Dict[str, float]]): Se informado, recebe os tempos medidos de espera
+            e de posse dos locks dos shards (em segundos) e o número de aquisições.
+
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: Estado final do livro de ordens, contendo listas de ordens de compra e venda.
+    """
+    shards = [{'buy': [], 'sell': []} for _ in range(num_shards)]
+    locks = [criar_lock("simular_traders_em_lotes.shard") for _ in range(num_shards)]
+    tempos: List[Tuple[int, float, float, float, float]] = []
+
+    def trader(indice: int) -> None:
+        rng = random.Random(None if seed is None else seed + indice)
+        shard = indice % num_shards
+        aquisicoes = 0
+        espera_total = posse_total = espera_max = posse_max = 0.0
+        pendentes: Dict[str, List[Dict[str, Any]]] = {'buy': [], 'sell': []}
+
+        def gravar() -> None:
+            nonlocal aquisicoes, espera_total, posse_total, espera_max, posse_max
+            t0 = time.perf_counter()
+            with locks[shard]:
+                t1 = time.perf_counter()
+                shards[shard]['buy'].extend(pendentes['buy'])
+                shards[shard]['sell'].extend(pendentes['sell'])
+                t2 = time.perf_counter()
+            aquisicoes += 1
+            espera_total += t1 - t0
+            posse_total += t2 - t1
+            espera_max = max(espera_max, t1 - t0)
+            posse_max = max(posse_max, t2 - t1)
+            pendentes['buy'] = []
+            pendentes['sell'] = []
+
+        for i in range(num_ordens):
+            ordem = {
+                'id': indice * num_ordens + i,
+                'price': round(rng.uniform(10, 100), 2),
+                'quantity': rng.randint(1, 100)
+            }
+            pendentes[rng.choice(['buy', 'sell'])].append(ordem)
+            if (i + 1) % tamanho_lote == 0:
+                gravar()
+        if pendentes['buy'] or pendentes['sell']:
+            gravar()
+        # list.append é atômico no CPython
+        tempos.append((aquisicoes, espera_total, posse_total, espera_max, posse_max))
+
+    threads = [criar_thread(target=trader, args=(i,)) for i in range(num_traders)]
     for t in threads:
         t.start()
     for t in threads:
         t.join()
 
+    order_book = {
+        lado: sorted((o for shard in shards for o in shard[lado]), key=lambda o: o['id'])
+        for lado in ('buy', 'sell')
+    }
+
+    if metricas is not None:
+        aquisicoes = sum(t[0] for t in tempos)
+        metricas.update({
+            'aquisicoes': aquisicoes,
+            'espera_total': sum(t[1] for t in tempos),
+            'posse_total': sum(t[2] for t in tempos),
+            'espera_max': max((t[3] for t in tempos), default=0.0),
+            'posse_max': max((t[4] for t in tempos), default=0.0),
+            'espera_media': sum(t[1] for t in tempos) / aquisicoes if aquisicoes else 0.0,
+            'posse_media': sum(t[2] for t in tempos) / aquisicoes if aquisicoes else 0.0,
+        })
+
     return order_book
 
 
-def simular_feeds_de_dados(acoes: List[str], tempo_total: int) -> Dict[str, float]:
+def simular_feeds_de_dados(acoes: List[str], tempo_total: int,
+                           barramento: Optional[BarramentoPrecos] = None,
+                           relogio: Optional[Relogio] = None) -> Dict[str, float]:
     """
     Simula múltiplos feeds de dados atualizando preços de ações concorrentemente.
 
     Cada ação tem sua própria thread que atualiza seu preço a cada 1–3 segundos.
     Outra thread imprime os preços a cada 5 segundos.
-    Um Lock garante acesso seguro ao dicionário de preços compartilhado.
+    Os feeds publicam em um `BarramentoPrecos`: cada thread é a única escritora
+    da sua ação e a impressão lê um snapshot consistente sem segurar lock, de
+    modo que leitores não atrasam os feeds mesmo com milhares de ações.
 
     Args:
         acoes (List[str]): Lista com os nomes das ações (ex: ['AAPL', 'GOOG']).
         tempo_total (int): Duração total da simulação (em segundos).
+        barramento (Optional[BarramentoPrecos]): Barramento já criado, para que outros
+            consumidores assinem as atualizações; deve conhecer todas as `acoes`.
+        relogio (Optional[Relogio]): Relógio da simulação; com um `RelogioVirtual` e o
+            `random` semeado, dias simulados rodam em segundos e de forma determinística.
 
     Returns:
         Dict[str, float]: Dicionário final com os preços atualizados das ações.
     """
-    prices: Dict[str, float] = {acao: random.uniform(50, 150) for acao in acoes}
-    lock = threading.Lock()
+    if barramento is None:
+        barramento = BarramentoPrecos(acoes)
+    if relogio is None:
+        relogio = RelogioReal()
+    iniciais = [random.uniform(50, 150) for _ in acoes]
+    barramento.publicar_lote(acoes, iniciais)
     running = True
 
-    def feed(acao: str) -> None:
+    def feed(acao: str, preco: float) -> None:
         nonlocal running
         while running:
-            time.sleep(random.uniform(1, 3))
-            with lock:
-                prices[acao] += random.uniform(-5, 5)
+            relogio.dormir(random.uniform(1, 3))
+            preco += random.uniform(-5, 5)
+            barramento.publicar(acao, preco)
 
     def imprimir_precos() -> None:
         nonlocal running
         while running:
-            time.sleep(5)
-            with lock:
-                print({k: round(v, 2) for k, v in prices.items()})
+            relogio.dormir(5)
+            print({k: round(v, 2) for k, v in barramento.snapshot().items()})
 
-    threads = [threading.Thread(target=feed, args=(acao,)) for acao in acoes]
-    threads.append(threading.Thread(target=imprimir_precos))
+    threads = [relogio.Thread(target=feed, args=(acao, preco)) for acao, preco in zip(acoes, iniciais)]
+    threads.append(relogio.Thread(target=imprimir_precos))
 
     for t in threads:
         t.start()
-    time.sleep(tempo_total)
+    relogio.dormir(tempo_total)
     running = False
     for t in threads:
         t.join()
 
-    return {k: round(v, 2) for k, v in prices.items()}
+    finais = barramento.snapshot()
+    return {acao: round(finais[acao], 2) for acao in acoes}